@@ -0,0 +1,135 @@
+"""Content-addressed cache of model fits.
+
+Inspect the cache with `python -m boilerdata.fit_cache`, or clear it with `--clear`.
+"""
+
+import json
+import marshal
+from argparse import ArgumentParser
+from collections.abc import Sequence
+from hashlib import sha256
+from os import getpid, utime
+from typing import Any
+
+import numpy as np
+
+from boilerdata.models.params import Params, get_params
+
+FIT_CACHE_VERSION = 2
+"""Version of the fit cache format. Increment to invalidate existing cached fits."""
+
+
+def main():  # noqa: D103
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clear", action="store_true", help="Clear the fit cache.")
+    args = parser.parse_args()
+    params = get_params()
+    if args.clear:
+        clear_fit_cache(params)
+    print(json.dumps(get_fit_cache_info(params), indent=2))  # noqa: T201
+
+
+def get_fit_keys(
+    params: Params,
+    model: Any,
+    x: Any,
+    y: Any,
+    y_errors: Any,
+    confidence_interval: float,
+) -> list[str]:
+    """Get cache keys for a batch of fits, one for each row of `y` and `y_errors`.
+
+    Keys depend on the data, fit settings including whether fits are warm-started, the
+    confidence interval, and the code of the model function, so cached fits are never
+    reused for different inputs.
+    """
+    common = sha256(
+        json.dumps([
+            FIT_CACHE_VERSION,
+            params.fit.fixed_values,
+            params.fit.free_params,
+            params.fit.initial_values,
+            params.fit.model_bounds,
+            params.warm_start_fits,
+            confidence_interval,
+        ]).encode("utf-8")
+    )
+    code = model.__code__
+    common.update(marshal.dumps((code.co_code, code.co_consts, code.co_names)))
+    common.update(np.ascontiguousarray(x, dtype=float).tobytes())
+    keys: list[str] = []
+    for y_row, y_errors_row in zip(
+        np.ascontiguousarray(y, dtype=float),
+        np.ascontiguousarray(y_errors, dtype=float),
+        strict=True,
+    ):
+        key = common.copy()
+        key.update(y_row.tobytes())
+        key.update(y_errors_row.tobytes())
+        keys.append(key.hexdigest())
+    return keys
+
+
+def load_cached_fits(
+    params: Params, keys: Sequence[str], width: int
+) -> tuple[Any, Any]:
+    """Load cached fits for each key, and whether each was found.
+
+    Fits that weren't found are filled with `NaN`. Found fits are marked as recently
+    used so that they are evicted last.
+    """
+    results = np.full((len(keys), width), np.nan)
+    hits = np.zeros(len(keys), dtype=bool)
+    for i, key in enumerate(keys):
+        path = params.paths.fit_cache / f"{key}.npy"
+        if path.exists():
+            results[i] = np.load(path)
+            hits[i] = True
+            utime(path)
+    return results, hits
+
+
+def save_cached_fits(params: Params, keys: Sequence[str], results: Any) -> None:
+    """Cache fits for each key, then evict fits if the cache is too large."""
+    for key, result in zip(keys, results, strict=True):
+        path = params.paths.fit_cache / f"{key}.npy"
+        tmp = path.with_name(f"{path.stem}_{getpid()}.tmp")
+        with tmp.open("wb") as file:
+            np.save(file, result)
+        tmp.replace(path)
+    evict_fit_cache(params)
+
+
+def evict_fit_cache(params: Params) -> None:
+    """Evict least-recently used fits until the cache fits in its maximum size."""
+    entries = sorted(
+        ((path, path.stat()) for path in params.paths.fit_cache.glob("*.npy")),
+        key=lambda entry: entry[1].st_mtime_ns,
+    )
+    size = sum(stat.st_size for _, stat in entries)
+    for path, stat in entries:
+        if size <= params.fit_cache_max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        size -= stat.st_size
+
+
+def get_fit_cache_info(params: Params) -> dict[str, Any]:
+    """Get the location, number of entries, and size of the fit cache."""
+    sizes = [path.stat().st_size for path in params.paths.fit_cache.glob("*.npy")]
+    return {
+        "path": params.paths.fit_cache.as_posix(),
+        "entries": len(sizes),
+        "bytes": sum(sizes),
+        "max_bytes": params.fit_cache_max_bytes,
+    }
+
+
+def clear_fit_cache(params: Params) -> None:
+    """Remove all cached fits."""
+    for path in params.paths.fit_cache.glob("*.npy"):
+        path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
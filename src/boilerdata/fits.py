@@ -0,0 +1,118 @@
+"""Batched model fits."""
+
+from collections.abc import Mapping
+from functools import partial
+from typing import Any
+
+import numpy as np
+from boilercore.fits import get_bounds, get_guesses
+from boilercore.types import Bound, Guess
+
+EPS = np.finfo(float).eps
+"""Machine epsilon."""
+
+MAX_ITERATIONS = 200
+"""Maximum Levenberg-Marquardt iterations for a batch."""
+
+TOLERANCE = 1e-12
+"""Relative tolerance on the change in cost and parameters for convergence."""
+
+
+def fit_batch(
+    model: Any,
+    fixed_values: Mapping[str, Any],
+    free_params: list[str],
+    initial_values: Mapping[str, Guess],
+    model_bounds: Mapping[str, Bound],
+    x: Any,
+    y: Any,
+    y_errors: Any,
+    confidence_interval: float,
+    initial: Any = None,
+) -> tuple[Any, Any, Any, Any]:
+    """Get fits and errors for a batch of problems sharing the same `x`.
+
+    Like `boilercore.fits.fit`, but `y` and `y_errors` have a leading batch dimension,
+    and fits and errors are returned with that same leading dimension. A bounded
+    Levenberg-Marquardt is run on all problems at once, weighting residuals by
+    `y_errors`, with the covariance computed from the Jacobian at the solution as in
+    `scipy.optimize.curve_fit`. Also returns whether each problem converged away from
+    its bounds, and the number of iterations each took. Problems that didn't converge
+    should be fit individually instead. Guesses can be given for each problem in
+    `initial`, otherwise they are taken from `initial_values`.
+
+    This is a different solver from the trust region reflective method of `fit`, so
+    fits and errors only agree with it to a relative tolerance of about 1e-4.
+    """
+    f = partial(model, **fixed_values)
+    lower, upper = (
+        np.array(b, dtype=float)
+        for b in zip(*get_bounds(free_params, model_bounds), strict=True)
+    )
+    p = (
+        np.tile(
+            np.array(get_guesses(free_params, initial_values), dtype=float), (len(y), 1)
+        )
+        if initial is None
+        else np.array(initial, dtype=float)
+    )
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    w = 1 / np.asarray(y_errors, dtype=float)
+
+    def get_residuals(p):
+        return (f(x, *p.T[..., None]) - y) * w
+
+    r = get_residuals(p)
+    cost = np.sum(r**2, axis=-1)
+    damping = np.full(len(y), 1e-3)
+    converged = np.zeros(len(y), dtype=bool)
+    iterations = np.zeros(len(y), dtype=int)
+    for _ in range(MAX_ITERATIONS):
+        if converged.all():
+            break
+        iterations += ~converged
+        jac = get_jacobian(get_residuals, p, r)
+        jtj = np.einsum("bni,bnj->bij", jac, jac)
+        jtr = np.einsum("bni,bn->bi", jac, r)
+        diag = np.einsum("bii->bi", jtj)
+        step = np.linalg.solve(
+            jtj + damping[:, None, None] * (diag[:, :, None] * np.eye(len(p.T))),
+            -jtr[..., None],
+        )[..., 0]
+        p_new = np.clip(p + step, lower, upper)
+        r_new = get_residuals(p_new)
+        cost_new = np.sum(r_new**2, axis=-1)
+        improved = (cost_new <= cost) & ~converged
+        converged |= improved & (
+            (cost - cost_new <= TOLERANCE * cost)
+            & np.all(np.abs(p_new - p) <= TOLERANCE * (TOLERANCE + np.abs(p)), axis=-1)
+        )
+        p = np.where(improved[:, None], p_new, p)
+        r = np.where(improved[:, None], r_new, r)
+        cost = np.where(improved, cost_new, cost)
+        damping = np.where(improved, damping / 10, damping * 10)
+        # A problem can't improve further once damping is no longer changing its step
+        converged |= damping > 1e16
+
+    # Compute covariance as `scipy.optimize.curve_fit` does, from the SVD of the Jacobian
+    _, s, vt = np.linalg.svd(get_jacobian(get_residuals, p, r), full_matrices=False)
+    threshold = EPS * max(len(x), len(p.T)) * s[:, :1]
+    s_inv = np.where(s > threshold, 1 / np.where(s > threshold, s, 1), 0)
+    pcov = np.einsum("bki,bk,bkj->bij", vt, s_inv**2, vt)
+    pcov = np.where((s > threshold).all(axis=-1)[:, None, None], pcov, np.inf)
+    errors = np.sqrt(np.einsum("bii->bi", pcov)) * confidence_interval
+    at_bounds = np.any(np.isclose(p, lower) | np.isclose(p, upper), axis=-1)
+    converged &= ~at_bounds & np.isfinite(errors).all(axis=-1)
+    return p, errors, converged, iterations
+
+
+def get_jacobian(get_residuals, p: Any, r: Any) -> Any:
+    """Get the Jacobian of residuals by forward differences, as `least_squares` does."""
+    h = EPS**0.5 * np.where(p >= 0, 1, -1) * np.maximum(1, np.abs(p))
+    jac = np.empty((*r.shape, len(p.T)))
+    for i in range(len(p.T)):
+        dp = np.zeros_like(p)
+        dp[:, i] = h[:, i]
+        jac[..., i] = (get_residuals(p + dp) - r) / h[:, i, None]
+    return jac
@@ -1,15 +1,21 @@
 """Project parameters."""
 
-from os import environ
+import json
+from functools import cache
+from hashlib import sha256
+from importlib.metadata import version
+from os import getpid, scandir
 from pathlib import Path
-from typing import Any
+from pickle import UnpicklingError
+from typing import Any, Literal
 
+import dill
 import pandas as pd
 from boilercore.models import SynchronizedPathsYamlModel
 from boilercore.models.fit import Fit
 from boilercore.models.geometry import Geometry
 from boilercore.models.trials import Trial, Trials
-from pydantic.v1 import Extra, Field
+from pydantic.v1 import Extra, Field, PrivateAttr
 
 from boilerdata import get_params_file
 from boilerdata.axes_enum import AxesEnum as A  # noqa: N814
@@ -18,6 +24,22 @@ from boilerdata.models.paths import Paths
 
 PARAMS_FILE = get_params_file()
 
+PARAMS_SNAPSHOT_VERSION = 2
+"""Version of the parameters snapshot format. Increment to invalidate snapshots."""
+
+SNAPSHOT_ERRORS = (
+    AttributeError,
+    EOFError,
+    ImportError,
+    TypeError,
+    ValueError,
+    UnpicklingError,
+)
+"""Errors unpickling a snapshot that is corrupt or refers to code that has changed."""
+
+TRIAL_TC_COLS = ["thermocouple_pos", "tcs", "tc_errors"]
+"""Columns of the trial table describing thermocouples, rather than trial metadata."""
+
 
 class Params(SynchronizedPathsYamlModel, extra=Extra.allow):
     """Global project parameters."""
@@ -29,6 +51,51 @@ class Params(SynchronizedPathsYamlModel, extra=Extra.allow):
         description="The number of records over which to average in a given trial.",
     )
 
+    workers: int = Field(
+        default=1,
+        description="The number of worker processes for stages that run in parallel.",
+    )
+
+    cache_runs: bool = Field(
+        default=True,
+        description="Whether to cache parsed runs as memory-mappable arrays, keyed by the fingerprints of their file and the axes config.",
+    )
+
+    run_cache_max_bytes: int = Field(
+        default=1_000_000_000,
+        description="Size of the run cache beyond which least-recently used runs are evicted.",
+    )
+
+    cache_fits: bool = Field(
+        default=True,
+        description="Whether to cache model fits, keyed by their data and fit settings.",
+    )
+
+    fit_cache_max_bytes: int = Field(
+        default=100_000_000,
+        description="Size of the fit cache beyond which least-recently used fits are evicted.",
+    )
+
+    warm_start_fits: bool = Field(
+        default=False,
+        description="Whether to seed model fits with the fit of the first run in the same trial.",
+    )
+
+    profile_memory: bool = Field(
+        default=False,
+        description="Whether to trace peak memory of pipeline steps. Tracing slows steps down many times over.",
+    )
+
+    csv_engine: Literal["c", "pyarrow"] = Field(
+        default="c",
+        description="The parser for run files. PyArrow only parses source columns, in multiple threads.",
+    )
+
+    export_csv: bool = Field(
+        default=False,
+        description="Whether to export CSVs next to the Parquet files output by stages.",
+    )
+
     # ! EXCLUDED FROM PARAMS FILE
 
     copper_temps: list[str] = Field(
@@ -50,6 +117,7 @@ class Params(SynchronizedPathsYamlModel, extra=Extra.allow):
 
     geometry: Geometry = Field(default_factory=Geometry)
     paths: Paths = Field(default_factory=Paths)
+    _trial_table: pd.DataFrame = PrivateAttr()
 
     def __init__(self, data_file: Path = PARAMS_FILE, **kwargs):
         super().__init__(data_file, **kwargs)
@@ -57,9 +125,39 @@ class Params(SynchronizedPathsYamlModel, extra=Extra.allow):
         self.trials = Trials(self.paths.trials_config).trials
         for trial in self.trials:
             trial.setup(self.paths, self.geometry, self.copper_temps)
+        self._trial_table = self.get_trial_table()
 
     # ! METHODS
 
+    @property
+    def trial_table(self) -> pd.DataFrame:
+        """Metadata and thermocouples of all trials, built once on construction."""
+        return self._trial_table
+
+    def get_trial_table(self) -> pd.DataFrame:
+        """Get metadata and thermocouples of all trials, indexed by trial timestamp.
+
+        Thermocouple columns are those in `TRIAL_TC_COLS`. Thermocouple positions are
+        tuples of thermocouple names and positions, so that they can be compared.
+        """
+        index = [idx.name for idx in self.axes.index]
+        return pd.DataFrame(
+            index=pd.Index([trial.timestamp for trial in self.trials], name=A.trial),
+            data=[
+                {
+                    field: value
+                    for field, value in trial.dict().items()  # Avoids excluded fields
+                    if field not in index
+                }
+                | {
+                    "thermocouple_pos": tuple(trial.thermocouple_pos.items()),
+                    "tcs": list(trial.thermocouple_pos),
+                    "tc_errors": [f"{tc}_err" for tc in trial.thermocouple_pos],
+                }
+                for trial in self.trials
+            ],
+        )
+
     def get_trial(self, timestamp: pd.Timestamp) -> Trial:
         """Get a trial by its timestamp."""
         for trial in self.trials:
@@ -67,28 +165,99 @@ class Params(SynchronizedPathsYamlModel, extra=Extra.allow):
                 return trial
         raise ValueError(f"Trial '{timestamp.date()}' not found.")
 
+    def get_trial_rows(self, timestamps: pd.Index) -> Any:
+        """Get the rows of the trial table for the trial of each timestamp."""
+        unique = timestamps.unique()
+        rows = self.trial_table.index.get_indexer([
+            pd.Timestamp(timestamp.date()) for timestamp in unique
+        ])
+        if (rows < 0).any():
+            raise ValueError(f"Trial '{unique[rows < 0][0].date()}' not found.")
+        return rows[unique.get_indexer(timestamps)]
+
     @classmethod
     def get_model_errors(cls, params) -> list[str]:
         """Get the error parameters for a given set of parameters."""
         return [f"{param}_err" for param in params]
 
 
-def init() -> tuple[Params, Any, Any, Any]:
-    """Parameters and associated project setup.
+@cache
+def get_params() -> Params:
+    """Get all project parameters, including paths, constructing them on first use.
 
-    Assigned to module constants at the end of this module.
+    Load a snapshot of previously-constructed parameters instead, if it is still valid.
     """
+    paths = Paths()
+    if (params := load_params_snapshot(paths)) is not None:
+        return params
     params = Params()
+    save_params_snapshot(params)
+    return params
+
+
+def get_params_snapshot_key(paths: Paths) -> str:
+    """Get the key of a parameters snapshot, which changes with any of its inputs.
 
-    # Override the default app folder
-    environ["DYNACONF_APP_FOLDER"] = environ["APP_FOLDER_FOR_DYNACONF"] = str(
-        params.paths.propshop
+    Inputs are the parameters and config files, the source of these models, and the
+    listing of each trial directory in the curves directory.
+    """
+    key = sha256(
+        json.dumps([
+            PARAMS_SNAPSHOT_VERSION,
+            paths.project.resolve().as_posix(),
+            version("boilercore"),
+        ]).encode("utf-8")
     )
-    from propshop import get_prop  # noqa: PLC0415
-    from propshop.library import Mat, Prop  # noqa: PLC0415
+    for path in [
+        PARAMS_FILE,
+        paths.axes_config,
+        paths.trials_config,
+        *sorted(paths.models.glob("*.py")),
+    ]:
+        key.update(path.read_bytes())
+    for trial in sorted(path for path in paths.trials.iterdir() if path.is_dir()):
+        with scandir(trial) as entries:
+            key.update(
+                json.dumps([
+                    trial.name,
+                    sorted(entry.name for entry in entries),
+                ]).encode("utf-8")
+            )
+    return key.hexdigest()
+
+
+def load_params_snapshot(paths: Paths) -> Params | None:
+    """Load a snapshot of parameters, or return `None` if it is missing or stale.
+
+    The key of the snapshot is unpickled and checked before its parameters, which are
+    only unpickled if it is fresh. Snapshots that can't be unpickled are also stale.
+    """
+    if not paths.file_params_snapshot.exists():
+        return None
+    try:
+        key, snapshot = dill.loads(paths.file_params_snapshot.read_bytes())
+        if key != get_params_snapshot_key(paths):
+            return None
+        return dill.loads(snapshot)
+    except SNAPSHOT_ERRORS:
+        return None
 
-    return params, get_prop, Mat, Prop
+
+def save_params_snapshot(params: Params) -> None:
+    """Save a snapshot of parameters, keyed by their inputs after construction.
+
+    Write to a temporary file first so that concurrent readers never see a partial file.
+    """
+    path = params.paths.file_params_snapshot
+    tmp = path.with_name(f"{path.stem}_{getpid()}.tmp")
+    tmp.write_bytes(
+        dill.dumps((get_params_snapshot_key(params.paths), dill.dumps(params)))
+    )
+    tmp.replace(path)
 
 
-PARAMS, get_prop, Mat, Prop = init()
-"""All project parameters, including paths."""
+def __getattr__(name: str) -> Any:
+    """Get `PARAMS`, all project parameters, constructing them on first access."""
+    if name == "PARAMS":
+        return get_params()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -20,6 +20,12 @@ class Paths(CreatePathsModel):
     # * Local inputs
     propshop: DirectoryPath = data / "propshop"
 
+    # * Local caches
+    cache: DirectoryPath = data / "cache"
+    run_cache: DirectoryPath = cache / "runs"
+    fit_cache: DirectoryPath = cache / "fits"
+    file_params_snapshot: Path = cache / "params.dillpickle"
+
     # * Git-tracked inputs
     # ! Package
     package: DirectoryPath = get_package_dir(boilerdata)
@@ -29,6 +35,8 @@ class Paths(CreatePathsModel):
         package / "stages", suffixes=[".py", ".ipynb"]
     )
     validation: FilePath = package / "validation.py"
+    fits: FilePath = package / "fits.py"
+    properties: FilePath = package / "properties.py"
     # ! Config
     # Careful, "Config" is a special member of BaseClass
     config: DirectoryPath = data / "config"
@@ -84,10 +92,13 @@ class Paths(CreatePathsModel):
     plot_error_h_a: Path = plots / "error_h_a.png"
     # ! Results
     results: DirectoryPath = data / "results"
-    file_results: Path = results / "results.csv"
+    file_results: Path = results / "results.parquet"
+    file_fit_stats: Path = results / "fit_stats.json"
     # ! Runs
     runs: DirectoryPath = data / "runs"
-    file_runs: Path = runs / "runs.csv"
+    file_runs: Path = runs / "runs.parquet"
+    file_runs_manifest: Path = runs / "runs_manifest.json"
     # ! Tables
     tables: DirectoryPath = data / "tables"
     file_pipeline_metrics: Path = tables / "pipeline_metrics.json"
+    file_pipeline_profile: Path = tables / "pipeline_profile.json"
@@ -0,0 +1,136 @@
+"""Profile steps of the pipeline."""
+
+import heapq
+import tracemalloc
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter, process_time
+from typing import Any
+
+import pandas as pd
+
+from boilerdata.axes_enum import AxesEnum as A  # noqa: N814
+
+active_profiler: ContextVar["Profiler | None"] = ContextVar(
+    "active_profiler", default=None
+)
+"""The profiler of the step being run, if any. Used to time groups within steps."""
+
+
+class Profiler:
+    """Record wall time, CPU time, sizes, and optionally peak memory of pipeline steps.
+
+    Wrap steps with `step`, e.g. `df.pipe(profiler.step(func), ...)`. Groups applied
+    serially by `per_index` during a step are timed, as are blocks of a step wrapped in
+    `time_group`, and the slowest are recorded. Peak memory is only traced if `memory`,
+    since tracing slows steps down many times over. CPU time and memory are only
+    measured in this process, not in worker processes.
+    """
+
+    def __init__(self, slowest: int = 5, memory: bool = False):
+        self.slowest = slowest
+        self.memory = memory
+        self.steps: dict[str, dict[str, Any]] = {}
+        self.groups: list[tuple[float, str]] = []
+
+    def step(
+        self, func: Callable[..., Any], name: str | None = None
+    ) -> Callable[..., Any]:
+        """Wrap a step so that it is profiled whenever it is called."""
+        name = name or getattr(func, "__name__", type(func).__name__)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            frame = args[0] if args and isinstance(args[0], pd.DataFrame) else None
+            with self.profile(name) as record:
+                result = func(*args, **kwargs)
+            if frame is not None:
+                record |= {"rows_in": len(frame), **get_counts(frame)}
+            if isinstance(result, pd.DataFrame):
+                record["rows_out"] = len(result)
+            return result
+
+        return wrapper
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[dict[str, Any]]:
+        """Profile a block, recording results under a step name."""
+        tracing, memory = tracemalloc.is_tracing(), 0
+        if self.memory:
+            if not tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            memory, _ = tracemalloc.get_traced_memory()
+        self.groups = []
+        token = active_profiler.set(self)
+        record: dict[str, Any] = {}
+        wall, cpu = perf_counter(), process_time()
+        try:
+            yield record
+        finally:
+            wall, cpu = perf_counter() - wall, process_time() - cpu
+            active_profiler.reset(token)
+            record |= {"wall_s": wall, "cpu_s": cpu}
+            if self.memory:
+                _, peak = tracemalloc.get_traced_memory()
+                if not tracing:
+                    tracemalloc.stop()
+                record["peak_memory_bytes"] = peak - memory
+            if self.groups:
+                record |= {
+                    "groups": len(self.groups),
+                    "slowest_groups_s": {
+                        group: seconds
+                        for seconds, group in heapq.nlargest(self.slowest, self.groups)
+                    },
+                }
+            self.steps[name] = record
+
+    @contextmanager
+    def time_group(self, name: str) -> Iterator[None]:
+        """Time a block as a group of the step being profiled."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.groups.append((perf_counter() - start, name))
+
+    def time_groups(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Wrap a function applied to groups so that each call is timed."""
+
+        @wraps(func)
+        def wrapper(grp: pd.DataFrame, *args, **kwargs):
+            with self.time_group(get_group_name(grp)):
+                return func(grp, *args, **kwargs)
+
+        return wrapper
+
+
+def time_group(name: str) -> AbstractContextManager[None]:
+    """Time a block as a group of the step being profiled, if any."""
+    profiler = active_profiler.get()
+    return nullcontext() if profiler is None else profiler.time_group(name)
+
+
+def get_counts(df: pd.DataFrame) -> dict[str, int]:
+    """Count the trials and runs in a dataframe."""
+    return {
+        key: df.index.get_level_values(level).nunique()
+        for key, level in {"trials": A.trial, "runs": A.run}.items()
+        if level in df.index.names
+    }
+
+
+def get_group_name(grp: pd.DataFrame) -> str:
+    """Get the name of a group applied by `per_index`, such as its trial and run."""
+    return get_key_name(getattr(grp, "name", ()))
+
+
+def get_key_name(key: Any) -> str:
+    """Get the name of a group key, such as a trial and run."""
+    return " ".join(
+        part.isoformat() if isinstance(part, pd.Timestamp) else str(part)
+        for part in (key if isinstance(key, tuple) else (key,))
+    )
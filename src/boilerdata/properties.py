@@ -0,0 +1,85 @@
+"""Thermophysical properties."""
+
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+from pyXSteam.XSteam import XSteam
+from scipy.constants import convert_temperature
+from scipy.interpolate import CubicSpline
+
+from boilerdata.models.params import Params
+
+SATURATION_PRESSURE_BAND = (10.0, 20.0)
+"""Pressures (psi) over which saturation temperature is interpolated."""
+
+SATURATION_KNOTS = 101
+"""Saturation temperatures to interpolate between. Error is below 1e-7 F in the band."""
+
+COPPER_TABLE = Path("tables") / "COPPER.feather"
+"""Copper property table, relative to the `propshop` data folder."""
+
+
+def get_copper_conductivity(params: Params, temperatures: Any) -> Any:
+    """Get thermal conductivity (W/m-K) of copper at temperatures (K).
+
+    Linearly interpolate the `propshop` conductivity table, as `propshop` does, raising
+    if temperatures are out of its range.
+    """
+    temps, conductivities = load_copper_conductivity(
+        params.paths.propshop / COPPER_TABLE
+    )
+    temperatures = np.asarray(temperatures, dtype=float)
+    if np.any((temperatures < temps[0]) | (temperatures > temps[-1])):
+        raise ValueError("A temperature is out of range of the conductivity table.")
+    return np.interp(temperatures, temps, conductivities)
+
+
+@cache
+def load_copper_conductivity(source: Path) -> tuple[Any, Any]:
+    """Load the copper conductivity table from `propshop` data, sorted by temperature.
+
+    The table is only read once per process, without importing `propshop`.
+    """
+    df = (
+        pd.read_feather(source, columns=["TEMPERATURE", "THERMAL_CONDUCTIVITY"])
+        .dropna()
+        .sort_values("TEMPERATURE")
+    )
+    return (
+        df["TEMPERATURE"].to_numpy(dtype=float),
+        df["THERMAL_CONDUCTIVITY"].to_numpy(dtype=float),
+    )
+
+
+def get_saturation_temp(pressure: Any) -> Any:
+    """Get saturation temperatures (C) of water at pressures (psi).
+
+    Interpolate within `SATURATION_PRESSURE_BAND`, evaluating exactly outside of it.
+    Each distinct pressure is only evaluated once.
+    """
+    unique, inverse = np.unique(np.asarray(pressure, dtype=float), return_inverse=True)
+    temps = np.full(unique.shape, np.nan)
+    lo, hi = SATURATION_PRESSURE_BAND
+    in_band = (unique >= lo) & (unique <= hi)
+    temps[in_band] = get_saturation_spline()(unique[in_band])
+    tsat_p = get_tsat_p()
+    outside = ~in_band & ~np.isnan(unique)
+    temps[outside] = [tsat_p(p) for p in unique[outside]]
+    return convert_temperature(temps[inverse].reshape(np.shape(pressure)), "F", "C")
+
+
+@cache
+def get_saturation_spline() -> CubicSpline:
+    """Get a spline of saturation temperature (F) over `SATURATION_PRESSURE_BAND`."""
+    tsat_p = get_tsat_p()
+    pressures = np.linspace(*SATURATION_PRESSURE_BAND, SATURATION_KNOTS)
+    return CubicSpline(pressures, [tsat_p(p) for p in pressures])
+
+
+@cache
+def get_tsat_p():
+    """Get the exact saturation temperature (F) lookup function for pressure (psi)."""
+    return XSteam(XSteam.UNIT_SYSTEM_FLS).tsat_p
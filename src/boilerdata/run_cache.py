@@ -0,0 +1,173 @@
+"""Cache of parsed runs as memory-mappable arrays.
+
+Inspect the cache with `python -m boilerdata.run_cache`, or clear it with `--clear`.
+"""
+
+import json
+import marshal
+from argparse import ArgumentParser
+from functools import cache
+from hashlib import sha256
+from os import getpid, utime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from boilerdata.models.params import Params, get_params
+
+RUN_CACHE_VERSION = 3
+"""Version of the run cache format. Increment to invalidate existing cached runs."""
+
+PARSERS = [
+    "parse_run",
+    "get_run_tail",
+    "read_last_lines",
+    "read_lines_in_chunks",
+    "read_run",
+    "read_run_c",
+    "read_run_pyarrow",
+    "get_source_cols",
+    "rename_columns",
+]
+"""Functions in `boilerdata.stages` that parse runs. Cached runs go stale with them."""
+
+
+def main():  # noqa: D103
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clear", action="store_true", help="Clear the run cache.")
+    args = parser.parse_args()
+    params = get_params()
+    if args.clear:
+        clear_run_cache(params)
+    print(json.dumps(get_run_cache_info(params), indent=2))  # noqa: T201
+
+
+def get_run_cache_key(params: Params, run: Path, records: int | None) -> str:
+    """Get the run cache key for a run file parsed with the current axes config.
+
+    Keys depend on the path, size, and modification time of the run file and the axes
+    config, like the fingerprints in the runs manifest, so files are never read here.
+    Keys also depend on the CSV engine and the code of the parsers.
+    """
+    return sha256(
+        json.dumps([
+            RUN_CACHE_VERSION,
+            params.csv_engine,
+            get_parsers_hash(),
+            *(
+                [path.resolve().as_posix(), *get_file_stat(path).values()]
+                for path in (run, params.paths.axes_config)
+            ),
+            records,
+        ]).encode("utf-8")
+    ).hexdigest()
+
+
+@cache
+def get_parsers_hash() -> str:
+    """Get a hash of the code of the run parsers in `PARSERS`."""
+    from boilerdata import stages  # noqa: PLC0415  # Stages import this module
+
+    key = sha256()
+    for name in PARSERS:
+        code = getattr(stages, name).__code__
+        key.update(marshal.dumps((code.co_code, code.co_consts, code.co_names)))
+    return key.hexdigest()
+
+
+def get_file_stat(path: Path) -> dict[str, int]:
+    """Get the size and modification time of a file, which change when it's written."""
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def get_run_cache_paths(params: Params, key: str) -> tuple[Path, Path]:
+    """Get paths to the cached index and values of a run."""
+    return (
+        params.paths.run_cache / f"{key}_index.npy",
+        params.paths.run_cache / f"{key}_values.npy",
+    )
+
+
+def load_cached_run(params: Params, key: str) -> pd.DataFrame | None:
+    """Map a cached run into a dataframe, or return `None` if it isn't cached.
+
+    Found runs are marked as recently used so that they are evicted last.
+    """
+    index_path, values_path = get_run_cache_paths(params, key)
+    if not (index_path.exists() and values_path.exists()):
+        return None
+    for path in (index_path, values_path):
+        utime(path)
+    source_cols = params.axes.source_cols
+    return pd.DataFrame(
+        index=pd.DatetimeIndex(
+            np.load(index_path, mmap_mode="r"), name=params.axes.index[-1].source
+        ),
+        columns=[col.name for col in source_cols],
+        data=np.load(values_path, mmap_mode="r"),
+        copy=False,
+    ).astype({col.name: col.dtype for col in source_cols if col.dtype != "float"})
+
+
+def save_cached_run(params: Params, key: str, df: pd.DataFrame) -> None:
+    """Cache a parsed run as memory-mappable arrays of its index and values.
+
+    Write to temporary files first so that concurrent readers never see partial files.
+    """
+    for path, arr in zip(
+        get_run_cache_paths(params, key),
+        (df.index.to_numpy(), df.to_numpy(dtype=float)),
+        strict=True,
+    ):
+        tmp = path.with_name(f"{path.stem}_{getpid()}.tmp")
+        with tmp.open("wb") as file:
+            np.save(file, arr)
+        tmp.replace(path)
+
+
+def get_run_cache_entries(params: Params) -> dict[str, list[tuple[Path, Any]]]:
+    """Get the files of each cached run, with their stats."""
+    entries: dict[str, list[tuple[Path, Any]]] = {}
+    for path in params.paths.run_cache.glob("*.npy"):
+        key = path.stem.rsplit("_", 1)[0]
+        entries.setdefault(key, []).append((path, path.stat()))
+    return entries
+
+
+def evict_run_cache(params: Params) -> None:
+    """Evict least-recently used runs until the cache fits in its maximum size."""
+    entries = sorted(
+        get_run_cache_entries(params).values(),
+        key=lambda files: max(stat.st_mtime_ns for _, stat in files),
+    )
+    size = sum(stat.st_size for files in entries for _, stat in files)
+    for files in entries:
+        if size <= params.run_cache_max_bytes:
+            break
+        for path, stat in files:
+            path.unlink(missing_ok=True)
+            size -= stat.st_size
+
+
+def get_run_cache_info(params: Params) -> dict[str, Any]:
+    """Get the location, number of entries, and size of the run cache."""
+    entries = get_run_cache_entries(params)
+    return {
+        "path": params.paths.run_cache.as_posix(),
+        "entries": len(entries),
+        "bytes": sum(stat.st_size for files in entries.values() for _, stat in files),
+        "max_bytes": params.run_cache_max_bytes,
+    }
+
+
+def clear_run_cache(params: Params) -> None:
+    """Remove all cached runs."""
+    for path in params.paths.run_cache.glob("*.npy"):
+        path.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
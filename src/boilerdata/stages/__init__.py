@@ -1,38 +1,173 @@
 """Stages."""
 
-from collections.abc import Mapping, Sequence
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import contextmanager
+from functools import cache, partial
+from hashlib import file_digest
+from io import SEEK_END, BytesIO
+from itertools import pairwise
+from math import ceil
 from pathlib import Path
-from typing import TypeVar
+from typing import Any, BinaryIO, TypeVar
 
-import matplotlib as mpl
+import dill
+import numpy as np
 import pandas as pd
-from boilercore.fits import plot_fit
-from boilercore.modelfun import get_model
+import pyarrow as pa
 from boilercore.models.trials import Trial
-from matplotlib import pyplot as plt
+from pyarrow import csv
 
 from boilerdata.axes_enum import AxesEnum as A  # noqa: N814
-from boilerdata.models.params import PARAMS, Params
+from boilerdata.models.axes import Axis
+from boilerdata.models.params import Params, get_params
+from boilerdata.profiling import active_profiler
+from boilerdata.run_cache import get_run_cache_key, load_cached_run, save_cached_run
 
 idxs = pd.IndexSlice
 """Use to slice pd.MultiIndex indices."""
 
-MODEL, MODEL_WITH_UNCERTAINTY = get_model(PARAMS.paths.model)
+
+@cache
+def get_models() -> tuple[Any, Any]:
+    """Get the model function and the model function with uncertainty."""
+    from boilercore.modelfun import get_model  # noqa: PLC0415
+
+    return get_model(get_params().paths.model)
+
+
+def __getattr__(name: str) -> Any:
+    """Get `MODEL` or `MODEL_WITH_UNCERTAINTY`, loading them on first access."""
+    if name == "MODEL":
+        return get_models()[0]
+    if name == "MODEL_WITH_UNCERTAINTY":
+        return get_models()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # * -------------------------------------------------------------------------------- * #
 # * DATA MANIPULATION
 
 
-def get_run(params: Params, run: Path) -> pd.DataFrame:
-    """Get data for a single run."""
+def get_run(params: Params, run: Path, records: int | None = None) -> pd.DataFrame:
+    """Get data for a single run.
+
+    If `records` is given, get only that many valid records from the end of the run.
+    Seek back from the end of the file rather than parsing every record in it. If
+    `params.cache_runs`, map a previously-parsed copy of the run from the run cache.
+    """
+    if not params.cache_runs:
+        return parse_run(params, run, records)
+    key = get_run_cache_key(params, run, records)
+    if (df := load_cached_run(params, key)) is not None:
+        return df
+    df = parse_run(params, run, records)
+    save_cached_run(params, key, df)
+    return df
+
+
+def parse_run(params: Params, run: Path, records: int | None = None) -> pd.DataFrame:
+    """Parse data for a single run, or only its last valid `records`."""
+    if records is None:
+        return read_run(params, run)
+    return get_run_tail(params, run, records)
+
+
+def get_run_tail(
+    params: Params, run: Path, records: int, cols: Sequence[str] | None = None
+) -> pd.DataFrame:
+    """Get the last valid records of a run by parsing only the end of the file.
+
+    If `cols` is given, only parse those source columns, by name.
+    """
+    # Read extra lines, as trailing lines may be NA records or have an NA index
+    lines = 2 * records
+    with run.open("rb") as file:
+        header = file.readline()
+        body_start = file.tell()
+        while True:
+            body, whole_body = read_last_lines(file, lines, body_start)
+            df = read_run(params, BytesIO(header + body), cols)
+            if len(df) >= records or whole_body:
+                return df.tail(records)
+            lines *= 2
+
+
+def read_last_lines(
+    file: BinaryIO, lines: int, start: int = 0, chunk_size: int = 2**16
+) -> tuple[bytes, bool]:
+    """Read at least the last few complete lines of a file opened in binary mode.
+
+    Seeks back from the end of the file in chunks, never before `start`. Returns the
+    complete lines found and whether reading went all the way back to `start`.
+    """
+    pos = file.seek(0, SEEK_END)
+    data = b""
+    # One more newline than lines requested, so the first line is known to be whole
+    while pos > start and data.count(b"\n") <= lines:
+        size = min(chunk_size, pos - start)
+        pos -= size
+        file.seek(pos)
+        data = file.read(size) + data
+    if pos > start:
+        data = data[data.index(b"\n") + 1 :]
+    return data, pos <= start
+
+
+def read_lines_in_chunks(file: BinaryIO, chunk_size: int = 2**16) -> Iterator[bytes]:
+    """Read complete lines of a file opened in binary mode, in chunks.
+
+    Reads forward from the current position. Chunks double in size, so that few are
+    read whether the lines needed are near the start or far from it. The last chunk may
+    end without a newline.
+    """
+    rest = b""
+    while data := file.read(chunk_size):
+        data = rest + data
+        end = data.rfind(b"\n") + 1
+        rest = data[end:]
+        if end:
+            yield data[:end]
+        chunk_size *= 2
+    if rest:
+        yield rest
+
+
+def read_run(
+    params: Params, run: Path | BinaryIO, cols: Sequence[str] | None = None
+) -> pd.DataFrame:
+    """Read and clean data for a single run from a file or buffer.
+
+    If `cols` is given, only parse those source columns, by name.
+    """
+    df = (
+        read_run_pyarrow(params, run, cols)
+        if params.csv_engine == "pyarrow"
+        else read_run_c(params, run, cols)
+        # Rarely a run has an all NA record at the end
+    ).dropna(how="all")
+
+    # Need "df" defined so we can call "df.index.dropna()". Repeat `dropna` because a
+    # run can have an NA index at the end and a CSV can have an all NA record at the end
+    return (
+        df.reindex(index=df.index.dropna())
+        .dropna(how="all")
+        .pipe(rename_columns, params)
+    )
+
+
+def read_run_c(
+    params: Params, run: Path | BinaryIO, cols: Sequence[str] | None = None
+) -> pd.DataFrame:
+    """Read source columns of a run with the default Pandas CSV parser."""
     # Get source columns
     index = params.axes.index[-1].source  # Get the last index, associated with source
-    source_col_names = [col.source for col in params.axes.source_cols]
-    source_dtypes = {col.source: col.dtype for col in params.axes.source_cols}
+    source_cols = get_source_cols(params, cols)
+    source_col_names = [col.source for col in source_cols]
+    source_dtypes = {col.source: col.dtype for col in source_cols}
 
-    # Assign columns from CSV and metadata to the structured dataframe. Get the tail.
-    df = pd.DataFrame(
+    # Assign columns from CSV and metadata to the structured dataframe
+    return pd.DataFrame(
         columns=source_col_names,
         data=pd.read_csv(
             run,
@@ -43,18 +178,45 @@ def get_run(params: Params, run: Path) -> pd.DataFrame:
             dtype=source_dtypes,
             encoding="utf-8",
         ),
-        # Rarely a run has an all NA record at the end
-    ).dropna(how="all")
+    )
 
-    # Need "df" defined so we can call "df.index.dropna()". Repeat `dropna` because a
-    # run can have an NA index at the end and a CSV can have an all NA record at the end
+
+def read_run_pyarrow(
+    params: Params, run: Path | BinaryIO, cols: Sequence[str] | None = None
+) -> pd.DataFrame:
+    """Read source columns of a run with the multithreaded PyArrow CSV parser.
+
+    Only source columns are parsed. Missing source columns (such as certain
+    thermocouples) are filled with nulls of the type given by their dtype.
+    """
+    index = params.axes.index[-1].source  # Get the last index, associated with source
+    column_types = {index: pa.timestamp("ns")} | {
+        col.source: pa.from_numpy_dtype(np.dtype(col.dtype))
+        for col in get_source_cols(params, cols)
+    }
     return (
-        df.reindex(index=df.index.dropna())
-        .dropna(how="all")
-        .pipe(rename_columns, params)
+        csv.read_csv(
+            run,
+            convert_options=csv.ConvertOptions(
+                column_types=column_types,
+                include_columns=list(column_types),
+                include_missing_columns=True,
+            ),
+        )
+        .to_pandas(split_blocks=True, self_destruct=True)
+        .set_index(index)
     )
 
 
+def get_source_cols(params: Params, cols: Sequence[str] | None = None) -> list[Axis]:
+    """Get source columns, or only those with names in `cols` if given."""
+    return [col for col in params.axes.source_cols if cols is None or col.name in cols]
+
+
+# * -------------------------------------------------------------------------------- * #
+# * TRIALS AND DTYPES
+
+
 def get_trial(df: pd.DataFrame, params: Params) -> Trial:
     """Get the trial represented in a given dataframe, verifying it is the only one."""
     trials_in_df = df.index.get_level_values(A.trial)
@@ -80,39 +242,169 @@ def set_proj_dtypes(df: pd.DataFrame, params: Params) -> pd.DataFrame:
     return set_dtypes(df, {col.name: col.dtype for col in params.axes.cols})
 
 
+def read_frame(
+    path: Path, params: Params, columns: Sequence[str] | None = None
+) -> pd.DataFrame:
+    """Read a stage output written by `write_frame`, optionally only certain columns.
+
+    Index and column dtypes are stored in the Parquet file itself. Only columns that
+    don't survive the round trip, such as categoricals without any categories, are cast
+    to their project-specific dtypes again.
+    """
+    df = pd.read_parquet(path, columns=columns)
+    return set_dtypes(
+        df,
+        {
+            col.name: col.dtype
+            for col in params.axes.cols
+            if col.name in df.columns and df[col.name].dtype != col.dtype
+        },
+    )
+
+
+def write_frame(df: pd.DataFrame, path: Path, params: Params) -> None:
+    """Write a stage output to Parquet, optionally exporting a CSV next to it."""
+    df.to_parquet(path)
+    if params.export_csv:
+        df.to_csv(path.with_suffix(".csv"), encoding="utf-8")
+
+
 def per_index(
     df: pd.DataFrame,
     level: str | list[str],
     per_index_func,
     params: Params,
     *args,
+    workers: int = 1,
     **kwargs,
 ) -> pd.DataFrame:
-    """Group dataframe by index and apply a function to the groups, setting dtypes."""
-    df = (
-        df.groupby(level=level, sort=False, group_keys=False)  # type: ignore
-        .apply(per_index_func, params, *args, **kwargs)
-        .pipe(set_proj_dtypes, params)
-    )
-    return df
+    """Group dataframe by index and apply a function to the groups, setting dtypes.
+
+    Apply the function in a pool of `workers` processes if more than one. Parameters
+    and other arguments are sent to each worker once, and results are reassembled in
+    group order. Groups applied serially are timed by the active profiler, if any.
+    """
+    if workers <= 1:
+        if (profiler := active_profiler.get()) is not None:
+            per_index_func = profiler.time_groups(per_index_func)
+        return (
+            df.groupby(level=level, sort=False, group_keys=False)  # type: ignore
+            .apply(per_index_func, params, *args, **kwargs)
+            .pipe(set_proj_dtypes, params)
+        )
+    return pd.concat(
+        map_in_pool(
+            partial(
+                apply_to_group,
+                func=per_index_func,
+                params=params,
+                args=args,
+                kwargs=kwargs,
+            ),
+            [grp for _, grp in df.groupby(level=level, sort=False)],  # type: ignore
+            workers,
+        )
+    ).pipe(set_proj_dtypes, params)
+
+
+def apply_to_group(
+    grp: pd.DataFrame,
+    func,
+    params: Params,
+    args: tuple[Any, ...],
+    kwargs: dict[str, Any],
+) -> pd.DataFrame:
+    """Apply a function to a group as `per_index` does."""
+    return func(grp, params, *args, **kwargs)
 
 
 def per_trial(
-    df: pd.DataFrame, per_trial_func, params: Params, *args, **kwargs
+    df: pd.DataFrame, per_trial_func, params: Params, *args, workers: int = 1, **kwargs
 ) -> pd.DataFrame:
-    """Apply a function to individual trials."""
-    df = per_index(df, A.trial, per_trial_func, params, *args, **kwargs)
+    """Apply a function to individual trials, optionally in a pool of `workers`."""
+    df = per_index(
+        df, A.trial, per_trial_func, params, *args, workers=workers, **kwargs
+    )
     return df
 
 
 def per_run(
-    df: pd.DataFrame, per_run_func, params: Params, *args, **kwargs
+    df: pd.DataFrame, per_run_func, params: Params, *args, workers: int = 1, **kwargs
 ) -> pd.DataFrame:
-    """Apply a function to individual runs."""
-    df = per_index(df, [A.trial, A.run], per_run_func, params, *args, **kwargs)
+    """Apply a function to individual runs, optionally in a pool of `workers`."""
+    df = per_index(
+        df, [A.trial, A.run], per_run_func, params, *args, workers=workers, **kwargs
+    )
     return df
 
 
+def per_index_updates(
+    df: pd.DataFrame,
+    level: str | list[str],
+    per_index_func,
+    params: Params,
+    *args,
+    workers: int = 1,
+    **kwargs,
+) -> pd.DataFrame:
+    """Apply a function returning column updates to groups of a sorted index.
+
+    Sort the index once if needed, and slice each group by position rather than
+    grouping. The function returns a mapping of column names to values, either scalars
+    or values for each record in the group. Updates are gathered into columns then
+    assigned at once, taking a float or object dtype after those of the first group.
+    Project dtypes are not set, leaving that to the end of the pipeline. Apply the
+    function in a pool of `workers` processes if more than one.
+    """
+    df = df if df.index.is_monotonic_increasing else df.sort_index()
+    bounds = list(
+        pairwise(get_group_bounds(df, [level] if isinstance(level, str) else level))
+    )
+    groups = [df.iloc[start:stop] for start, stop in bounds]
+    updates: dict[str, Any] = {}
+    for (start, stop), group_updates in zip(
+        bounds,
+        map_in_pool(
+            partial(
+                apply_to_group,
+                func=per_index_func,
+                params=params,
+                args=args,
+                kwargs=kwargs,
+            ),
+            groups,
+            workers,
+        ),
+        strict=True,
+    ):
+        for col, values in group_updates.items():
+            if col not in updates:
+                numeric = np.issubdtype(np.asarray(values).dtype, np.number)
+                updates[col] = np.full(len(df), np.nan, float if numeric else object)
+            updates[col][start:stop] = values
+    return df.assign(**updates)
+
+
+def per_run_updates(
+    df: pd.DataFrame, per_run_func, params: Params, *args, workers: int = 1, **kwargs
+) -> pd.DataFrame:
+    """Apply a function returning column updates to individual runs."""
+    df = per_index_updates(
+        df, [A.trial, A.run], per_run_func, params, *args, workers=workers, **kwargs
+    )
+    return df
+
+
+def get_group_bounds(df: pd.DataFrame, levels: list[str]) -> Any:
+    """Get positions where groups start in a sorted index, followed by its length."""
+    changed = np.zeros(len(df), dtype=bool)
+    changed[:1] = True
+    for level in levels:
+        codes, _ = pd.factorize(df.index.get_level_values(level))
+        changed[1:] |= codes[1:] != codes[:-1]
+    return np.append(np.flatnonzero(changed), len(df))
+
+
 def add_units(
     df: pd.DataFrame, params: Params
 ) -> tuple[pd.DataFrame, Mapping[str, str]]:
@@ -127,6 +419,51 @@ def add_units(
     return df.rename(axis="columns", mapper=mapper), mapper
 
 
+# * -------------------------------------------------------------------------------- * #
+# * PARALLEL PROCESSING
+
+R = TypeVar("R")
+
+_worker_func: Callable[[Any], Any] | None = None
+"""Function set up in each worker process of a pool by `map_in_pool`."""
+
+
+def map_in_pool(
+    func: Callable[[Any], R], items: Iterable[Any], workers: int = 1
+) -> list[R]:
+    """Map a function over items, in a process pool if there are multiple workers.
+
+    Results are in the same order as `items`. Shared state such as parameters should be
+    bound to `func`, e.g. with `functools.partial`. It is serialized with `dill` and sent
+    to each worker once when it starts, rather than with every item.
+    """
+    items = list(items)
+    if workers <= 1 or len(items) <= 1:
+        return [func(item) for item in items]
+    workers = min(workers, len(items))
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=set_worker_func, initargs=(dill.dumps(func),)
+    ) as executor:
+        return list(
+            executor.map(
+                call_worker_func, items, chunksize=ceil(len(items) / (4 * workers))
+            )
+        )
+
+
+def set_worker_func(func: bytes):
+    """Set the function to be called in this worker process."""
+    global _worker_func  # noqa: PLW0603
+    _worker_func = dill.loads(func)
+
+
+def call_worker_func(item: Any) -> Any:
+    """Call the function set up in this worker process."""
+    if _worker_func is None:
+        raise RuntimeError("Worker function not set up.")
+    return _worker_func(item)
+
+
 # * -------------------------------------------------------------------------------- * #
 # * PLOTTING
 
@@ -134,6 +471,8 @@ def add_units(
 @contextmanager
 def manual_subplot_spacing():
     """Context manager that allows custom spacing of subplots."""
+    import matplotlib as mpl  # noqa: PLC0415
+
     with mpl.rc_context({"figure.autolayout": False}):
         yield
 
@@ -149,6 +488,10 @@ def tex_wrap(df: pd.DataFrame) -> tuple[pd.DataFrame, Mapping[str, str]]:
 
 def plot_new_fits(grp: pd.DataFrame, params: Params, model):
     """Plot model fits for trials marked as new."""
+    # Plotting is slow to import, so it is only imported when needed
+    from boilercore.fits import plot_fit  # noqa: PLC0415
+    from matplotlib import pyplot as plt  # noqa: PLC0415
+
     trial = get_trial(grp, params)
     if not trial.plot:
         return grp
@@ -214,6 +557,12 @@ def sep_unit(val: str) -> tuple[str, str]:
     return quantity, units
 
 
+def hash_file(path: Path) -> str:
+    """Get a hash of the contents of a file."""
+    with path.open("rb") as file:
+        return file_digest(file, "sha256").hexdigest()
+
+
 def get_tcs(trial: Trial) -> tuple[list[str], list[str]]:
     """Get the thermocouple names and their error names for this trial."""
     tcs = list(trial.thermocouple_pos.keys())
@@ -4,14 +4,15 @@ from pathlib import Path
 from shutil import copy
 from textwrap import dedent
 
-from boilerdata.models.params import PARAMS
+from boilerdata.models.params import get_params
 
 
 def main():  # noqa: D103
-    generate_axes_enum([ax.name for ax in PARAMS.axes.all], PARAMS.paths.axes_enum_copy)
-    copy(PARAMS.paths.axes_enum_copy, PARAMS.paths.axes_enum)
-    PARAMS.paths.file_originlab_coldes.write_text(
-        encoding="utf-8", data=PARAMS.axes.get_originlab_coldes()
+    params = get_params()
+    generate_axes_enum([ax.name for ax in params.axes.all], params.paths.axes_enum_copy)
+    copy(params.paths.axes_enum_copy, params.paths.axes_enum)
+    params.paths.file_originlab_coldes.write_text(
+        encoding="utf-8", data=params.axes.get_originlab_coldes()
     )
 
 
@@ -20,16 +20,17 @@ from typing import Any
 import numpy as np
 import pandas as pd
 
-from boilerdata.models.params import PARAMS
+from boilerdata.models.params import get_params
 
 
 def main():  # noqa: D103
+    params = get_params()
     raw_df = pd.DataFrame(
         columns=["year", "authors", "paper", "fig", "dataset", "ΔT", "q''"]
     )
     dfs: list[pd.DataFrame] = []
 
-    for paper in get_dirs_sorted(PARAMS.paths.literature):
+    for paper in get_dirs_sorted(params.paths.literature):
         paper_meta = tomllib.loads((paper / "paper.toml").read_text(encoding="utf-8"))
 
         for fig in get_dirs_sorted(paper):
@@ -43,7 +44,7 @@ def main():  # noqa: D103
             dfs.append(fig_df)
 
     df = pd.concat(dfs)
-    df.to_csv(PARAMS.paths.file_literature_results, index=False)
+    df.to_csv(params.paths.file_literature_results, index=False)
 
 
 def get_dirs_sorted(path: Path) -> list[Path]:
@@ -8,24 +8,20 @@ from time import sleep
 import originpro as op  # type: ignore  # Not installed in CI
 import pandas as pd
 
-from boilerdata.axes_enum import AxesEnum as A  # noqa: N814
-from boilerdata.models.params import PARAMS, Params
+from boilerdata.models.params import Params, get_params
+from boilerdata.stages import read_frame
 
 
 def main():  # noqa: D103
+    params = get_params()
     (
-        pd.read_csv(
-            PARAMS.paths.file_results,
-            index_col=(index := [A.trial, A.run]),
-            parse_dates=index,
-            dtype={col.name: col.dtype for col in PARAMS.axes.cols},
-        )
-        .pipe(transform_for_originlab, PARAMS)
-        .to_csv(PARAMS.paths.file_originlab_results, index=False, encoding="utf-8")
+        read_frame(params.paths.file_results, params)
+        .pipe(transform_for_originlab, params)
+        .to_csv(params.paths.file_originlab_results, index=False, encoding="utf-8")
     )
 
-    with open_originlab(PARAMS.paths.file_plotter):
-        for shortname, file in PARAMS.paths.originlab_plot_files.items():
+    with open_originlab(params.paths.file_plotter):
+        for shortname, file in params.paths.originlab_plot_files.items():
             gp = op.find_graph(shortname)
             fig = gp.save_fig(get_path(file), type="png")
             if not fig:
@@ -1,38 +1,84 @@
 """Parse benchmark runs."""
 
+from functools import partial
+from io import BytesIO
+from itertools import chain
 from pathlib import Path
 
 import pandas as pd
 
 from boilerdata.axes_enum import AxesEnum as A  # noqa: N814
-from boilerdata.models.params import PARAMS, Params
-from boilerdata.stages import get_run
+from boilerdata.models.params import Params, get_params
+from boilerdata.stages import get_run_tail, map_in_pool, read_lines_in_chunks, read_run
 
+THRESHOLD = 0.9
+"""Fraction of the total change in base temperature at which it has risen."""
 
-def main():  # noqa: D103
-    pd.DataFrame(data=get_benchmarks(PARAMS)).to_csv(
-        PARAMS.paths.file_benchmarks_parsed, encoding="utf-8"
+RECORDS = 10
+"""Records averaged at the start and end of a benchmark to get the total change."""
+
+
+def main(workers: int | None = None):  # noqa: D103
+    params = get_params()
+    pd.DataFrame(data=get_benchmarks(params, workers)).to_csv(
+        params.paths.file_benchmarks_parsed, encoding="utf-8"
     )
 
 
-def get_benchmarks(params: Params) -> pd.DataFrame:
-    """Get runs from all trials."""
-    benchmarks = [
-        get_run(params, benchmark).pipe(parse_benchmark, params)
-        for benchmark in Path(params.paths.benchmarks).glob("*.csv")
-    ]
-    return pd.concat(benchmarks)
+def get_benchmarks(params: Params, workers: int | None = None) -> pd.DataFrame:
+    """Get the 90% rise of all benchmarks, in order of their file names.
+
+    Parse benchmark files in a pool of `workers` processes, defaulting to
+    `params.workers`.
+    """
+    return pd.concat(
+        map_in_pool(
+            partial(get_benchmark, params),
+            sorted(Path(params.paths.benchmarks).glob("*.csv")),
+            params.workers if workers is None else workers,
+        )
+    )
+
+
+def get_benchmark(
+    params: Params, benchmark: Path, chunk_size: int = 2**16
+) -> pd.DataFrame:
+    """Get the 90% rise of a benchmark, parsing only the parts needed to find it.
+
+    Parse records at the start and end of the benchmark to get the total change in base
+    temperature, then parse chunks of records forward from the start until the rise.
+    Only the columns needed are parsed. Matches `parse_benchmark` on the whole run.
+    """
+    cols = [A.T_0, *params.copper_temps]
+    with benchmark.open("rb") as file:
+        header = file.readline()
+        chunks = (
+            read_run(params, BytesIO(header + lines), cols)
+            for lines in read_lines_in_chunks(file, chunk_size)
+        )
+        head: list[pd.DataFrame] = []
+        for chunk in chunks:
+            head.append(chunk)
+            if sum(map(len, head)) >= RECORDS:
+                break
+        start = pd.concat(head)[A.T_0].head(RECORDS).mean()
+        end = get_run_tail(params, benchmark, RECORDS, cols)[A.T_0].mean()
+        for chunk in chain(head, chunks):
+            risen = chunk[(chunk[A.T_0] - start) / (end - start) > THRESHOLD]
+            if not risen.empty:
+                return risen.head(1)[cols]
+    # Like `idxmax` in `parse_benchmark`, fall back to the first record
+    return pd.concat(head).head(1)[cols]
 
 
 def parse_benchmark(df: pd.DataFrame, params: Params) -> pd.DataFrame:
     """Get all temperatures when base temperature has risen 90% of its total change."""
-    threshold = 0.9
     df = df[[A.T_0, *params.copper_temps]]
     base = df[A.T_0]
-    start = base.head(10).mean()
-    end = base.tail(10).mean()
+    start = base.head(RECORDS).mean()
+    end = base.tail(RECORDS).mean()
     base_normalized = (base - start) / (end - start)
-    time_of_90_rise = (base_normalized > threshold).idxmax()
+    time_of_90_rise = (base_normalized > THRESHOLD).idxmax()
     return df.loc[[time_of_90_rise], :]
 
 
@@ -1,62 +1,83 @@
 """Pipeline."""
 
+import json
+from functools import partial
+from itertools import chain
 from typing import Any
 
 import numpy as np
 import pandas as pd
-from boilercore.fits import fit_from_params
+from boilercore.fits import fit_from_params, get_guesses
 from boilercore.models.trials import Trial
-from pyXSteam.XSteam import XSteam
 from scipy.constants import convert_temperature
 from scipy.stats import t
 
 from boilerdata.axes_enum import AxesEnum as A  # noqa: N814
-from boilerdata.models.params import PARAMS, Mat, Params, Prop, get_prop
-from boilerdata.stages import MODEL, get_tcs, get_trial, per_run, per_trial
-from boilerdata.validation import (
-    handle_invalid_data,
-    validate_final_df,
-    validate_initial_df,
+from boilerdata.fit_cache import get_fit_keys, load_cached_fits, save_cached_fits
+from boilerdata.fits import fit_batch
+from boilerdata.models.params import TRIAL_TC_COLS, Params, get_params
+from boilerdata.profiling import Profiler, get_key_name, time_group
+from boilerdata.properties import get_copper_conductivity, get_saturation_temp
+from boilerdata.stages import (
+    get_models,
+    get_tcs,
+    get_trial,
+    map_in_pool,
+    per_run_updates,
+    read_frame,
+    set_proj_dtypes,
+    write_frame,
 )
+from boilerdata.validation import get_schemas, handle_invalid_data
+
+Layout = tuple[tuple[str, float], ...]
+"""Thermocouples and their positions."""
+
+Tcs = tuple[list[str], list[str]]
+"""Thermocouple names and their error names."""
+
+MIN_BATCH_SIZE = 6
+"""Fewest runs to fit in a batch. Smaller batches are faster to fit individually."""
 
 
 def main():  # noqa: D103
-    confidence_interval_95 = t.interval(0.95, PARAMS.records_to_average)[1]
+    params = get_params()
+    confidence_interval_95 = t.interval(0.95, params.records_to_average)[1]
+    model, _ = get_models()
+    schemas = get_schemas()
+    fit_stats: dict[str, Any] = {}
+    profiler = Profiler(memory=params.profile_memory)
 
     (
-        pd.read_csv(
-            PARAMS.paths.file_runs,
-            index_col=(index_col := [A.trial, A.run, A.time]),
-            parse_dates=index_col,
-            dtype={col.name: col.dtype for col in PARAMS.axes.cols},
-        )
-        .pipe(handle_invalid_data, validate_initial_df)
-        .pipe(get_properties, PARAMS)
-        .pipe(per_run, fit, PARAMS, MODEL, confidence_interval_95)
-        .pipe(per_trial, agg_over_runs, PARAMS, confidence_interval_95)  # TCs may vary
-        .pipe(per_trial, get_superheat, PARAMS)  # Water temp varies across trials
-        .pipe(per_trial, assign_metadata, PARAMS)  # Metadata is distinct per trial
-        .pipe(validate_final_df)
-        .to_csv(PARAMS.paths.file_results, encoding="utf-8")
+        profiler.step(read_frame)(params.paths.file_runs, params)
+        .pipe(profiler.step(handle_invalid_data), schemas["validate_initial_df"])
+        .pipe(profiler.step(get_properties), params)
+        .pipe(profiler.step(fit_runs), params, model, confidence_interval_95, fit_stats)
+        .pipe(profiler.step(agg_over_runs), params, confidence_interval_95)
+        .pipe(profiler.step(get_superheat))
+        .pipe(profiler.step(assign_metadata), params)
+        .pipe(profiler.step(set_proj_dtypes), params)
+        .pipe(profiler.step(schemas["validate_final_df"], "validate_final_df"))
+        .pipe(profiler.step(write_frame), params.paths.file_results, params)
+    )
+    params.paths.file_fit_stats.write_text(
+        encoding="utf-8", data=json.dumps(fit_stats, indent=2)
+    )
+    params.paths.file_pipeline_profile.write_text(
+        encoding="utf-8", data=json.dumps(profiler.steps, indent=2)
     )
 
 
 def get_properties(df: pd.DataFrame, params: Params) -> pd.DataFrame:
     """Get properties."""
-    get_saturation_temp = XSteam(XSteam.UNIT_SYSTEM_FLS).tsat_p  # A lookup function
-
     T_w_avg = df[[A.T_w1, A.T_w2, A.T_w3]].mean(axis="columns")  # noqa: N806
-    T_w_p = convert_temperature(  # noqa: N806
-        df[A.P].apply(get_saturation_temp), "F", "C"
-    )
+    T_w_p = get_saturation_temp(df[A.P].to_numpy())  # noqa: N806
 
     return df.assign(
         **(
             {
-                A.k: lambda df: get_prop(
-                    Mat.COPPER,
-                    Prop.THERMAL_CONDUCTIVITY,
-                    convert_temperature((df[A.T_1] + df[A.T_5]) / 2, "C", "K"),
+                A.k: lambda df: get_copper_conductivity(
+                    params, convert_temperature((df[A.T_1] + df[A.T_5]) / 2, "C", "K")
                 ),
                 A.T_w: lambda df: (T_w_avg + T_w_p) / 2,
                 A.T_w_diff: lambda df: abs(T_w_avg - T_w_p),
@@ -66,6 +87,303 @@ def get_properties(df: pd.DataFrame, params: Params) -> pd.DataFrame:
     )
 
 
+def fit_runs(
+    df: pd.DataFrame,
+    params: Params,
+    model: Any,
+    confidence_interval_95: float,
+    stats: dict[str, Any] | None = None,
+) -> pd.DataFrame:
+    """Fit the data to a model function, batching runs with the same thermocouples.
+
+    Runs from trials with the same thermocouple positions are fit together. Runs that
+    don't converge in their batch, are in batches smaller than `MIN_BATCH_SIZE`, or
+    don't have `records_to_average` records, are fit individually by `fit` instead.
+    Batches use the solver in `fit_batch`, so results agree with fitting each run with
+    `fit` only to a relative tolerance of about 1e-4.
+    If `params.cache_fits`, fits of runs seen before are taken from the fit cache. If
+    `params.warm_start_fits`, fits are seeded from the first run in the same trial.
+    Runs fit individually are fit in a pool of `params.workers` processes if more than
+    one. Fit statistics such as iteration counts are recorded in `stats`, if given.
+    """
+    stats = {} if stats is None else stats
+    stats |= dict.fromkeys(
+        ["cached", "warm_started", "warm_start_fallbacks", "individual_fits"], 0
+    ) | {"iterations": []}
+    runs = df.groupby(level=[A.trial, A.run], sort=False)  # type: ignore  # pandas
+    run_codes = runs.ngroup().to_numpy()
+    run_sizes = runs.size().to_numpy()
+    trials = df.index.get_level_values(A.trial)
+    layouts, layout_masks = get_layouts(df, params)
+    df = assign_fit_inputs(df, params, layouts, layout_masks, run_codes)
+    run_count = len(run_sizes)
+    if not params.cache_fits and run_count < MIN_BATCH_SIZE:
+        # Skip batching overhead when no batch could be large enough
+        del stats["iterations"]
+        stats |= {
+            "individual_fits": run_count,
+            "runs": run_count,
+            "iterations_mean": 0.0,
+            "iterations_max": 0,
+        }
+        return per_run_updates(
+            df,
+            get_fit_updates,
+            params,
+            model,
+            confidence_interval_95,
+            workers=params.workers,
+        )
+    cols = [*params.fit.free_params, *params.fit.free_errors]
+    results = np.full((len(df), len(cols)), np.nan)
+    unfit = np.ones(len(run_sizes), dtype=bool)
+    batches: list[tuple[Any, Any, list[str], Any, Any]] = []
+    # Runs to fit individually, and the results and positions to fit them into
+    individual_runs: list[pd.DataFrame] = []
+    individual_results: list[tuple[Any, Any]] = []
+    for num, (layout, mask) in enumerate(layout_masks.items()):
+        tcs, tc_errors = layouts[layout]
+        rows = np.flatnonzero(
+            mask & (run_sizes == params.records_to_average)[run_codes]
+        )
+        if not len(rows):
+            continue
+        rows = rows[np.argsort(run_codes[rows], kind="stable")]
+        batch = np.unique(run_codes[rows])
+        x = np.tile([pos for _, pos in layout], params.records_to_average)
+        y = df[tcs].to_numpy()[rows].reshape(len(batch), -1)
+        y_errors = df[tc_errors].to_numpy()[rows].reshape(len(batch), -1)
+        keys, batch_results, misses, converged = fit_cached(
+            params,
+            model,
+            confidence_interval_95,
+            x,
+            y,
+            y_errors,
+            get_seeds(params, trials.to_numpy()[rows].reshape(len(batch), -1)[:, 0]),
+            f"batch {num}",
+            stats,
+        )
+        # Fit runs in small batches, or that didn't converge, individually
+        for i in np.flatnonzero(misses & ~converged):
+            individual_runs.append(df.iloc[rows[run_codes[rows] == batch[i]]])
+            individual_results.append((batch_results, i))
+        batches.append((rows, batch, keys, batch_results, misses))
+        unfit[batch] = False
+    # Runs without `records_to_average` records can only be fit individually
+    for code in np.flatnonzero(unfit):
+        rows = np.flatnonzero(run_codes == code)
+        individual_runs.append(df.iloc[rows])
+        individual_results.append((results, rows))
+    for (fits, pos), fitted in zip(
+        individual_results,
+        map_in_pool(
+            partial(
+                fit_run,
+                params=params,
+                model=model,
+                confidence_interval_95=confidence_interval_95,
+            ),
+            individual_runs,
+            params.workers,
+        ),
+        strict=True,
+    ):
+        fits[pos] = fitted
+    stats["individual_fits"] += len(individual_runs)
+    for rows, batch, keys, batch_results, misses in batches:
+        if params.cache_fits and misses.any():
+            save_cached_fits(
+                params, [keys[i] for i in np.flatnonzero(misses)], batch_results[misses]
+            )
+        results[rows] = batch_results[np.searchsorted(batch, run_codes[rows])]
+    iterations = stats.pop("iterations")
+    stats |= {
+        "runs": len(run_sizes),
+        "iterations_mean": float(np.mean(iterations)) if iterations else 0.0,
+        "iterations_max": int(np.max(iterations)) if iterations else 0,
+    }
+    return df.assign(**dict(zip(cols, results.T, strict=True)))
+
+
+def fit_cached(
+    params: Params,
+    model: Any,
+    confidence_interval_95: float,
+    x: Any,
+    y: Any,
+    y_errors: Any,
+    seeds: Any,
+    name: str,
+    stats: dict[str, Any],
+) -> tuple[list[str], Any, Any, Any]:
+    """Fit problems in a batch, taking fits of problems seen before from the fit cache.
+
+    Problems are only fit in a batch if at least `MIN_BATCH_SIZE` of them aren't cached,
+    timed as a group of the profiled step under `name`. Returns the cache keys, fits and
+    errors, whether each problem missed the cache, and whether each converged.
+    """
+    cols = len(params.fit.free_params) + len(params.fit.free_errors)
+    keys: list[str] = []
+    results = np.full((len(y), cols), np.nan)
+    misses = np.ones(len(y), dtype=bool)
+    if params.cache_fits:
+        keys = get_fit_keys(params, model, x, y, y_errors, confidence_interval_95)
+        results, hits = load_cached_fits(params, keys, cols)
+        misses = ~hits
+        stats["cached"] += int(hits.sum())
+    converged = np.zeros(len(y), dtype=bool)
+    if misses.sum() >= MIN_BATCH_SIZE:
+        with time_group(f"{name} of {misses.sum()} runs"):
+            converged = fit_warm(
+                params,
+                model,
+                confidence_interval_95,
+                x,
+                y,
+                y_errors,
+                results,
+                misses,
+                seeds,
+                stats,
+            )
+    return keys, results, misses, converged
+
+
+def fit_run(
+    run: pd.DataFrame, params: Params, model: Any, confidence_interval_95: float
+) -> Any:
+    """Fit a run individually with `fit`, timing it as a group of the profiled step."""
+    with time_group(get_key_name(run.index[0][:2])):
+        return fit(run, params, model, confidence_interval_95)[
+            [*params.fit.free_params, *params.fit.free_errors]
+        ].to_numpy()[0]
+
+
+def get_fit_updates(
+    run: pd.DataFrame, params: Params, model: Any, confidence_interval_95: float
+) -> dict[str, Any]:
+    """Get fits and errors of a run fit individually, as column updates."""
+    return dict(
+        zip(
+            [*params.fit.free_params, *params.fit.free_errors],
+            fit_run(run, params, model, confidence_interval_95),
+            strict=True,
+        )
+    )
+
+
+def get_layouts(
+    df: pd.DataFrame, params: Params
+) -> tuple[dict[Layout, Tcs], dict[Layout, Any]]:
+    """Get thermocouples of each thermocouple layout, and masks of their records."""
+    rows = params.get_trial_rows(df.index.get_level_values(A.trial))
+    table = params.trial_table
+    layouts: dict[Layout, Tcs] = {}
+    layout_masks: dict[Layout, Any] = {}
+    for row in np.unique(rows):
+        layout = table["thermocouple_pos"].iat[row]
+        layouts[layout] = (table["tcs"].iat[row], table["tc_errors"].iat[row])
+        layout_masks[layout] = layout_masks.get(layout, False) | (rows == row)
+    return layouts, layout_masks
+
+
+def assign_fit_inputs(
+    df: pd.DataFrame,
+    params: Params,
+    layouts: dict[Layout, Tcs],
+    layout_masks: dict[Layout, Any],
+    run_codes: Any,
+) -> pd.DataFrame:
+    """Assign thermocouple errors and missing fixed values as `fit` does."""
+    df = df.copy()
+    for layout, mask in layout_masks.items():
+        # Assign thermocouple errors by layout (since they can vary)
+        _, tc_errors = layouts[layout]
+        for col, error in (dict.fromkeys(tc_errors, 2.2) | {A.T_5_err: 1.0}).items():
+            df.loc[mask, col] = error
+    return df.assign(**{
+        key: df[key].where(~df[key].isna().groupby(run_codes).transform("all"), value)
+        for key, value in params.fit.fixed_values.items()
+    })
+
+
+def get_seeds(params: Params, trials: Any) -> Any:
+    """Get the problem to seed each problem from, or -1 for static guesses.
+
+    If `params.warm_start_fits`, problems are seeded from the first problem in their
+    trial, so that all problems are fit in at most two waves.
+    """
+    if not params.warm_start_fits:
+        return np.full(len(trials), -1)
+    _, first, inverse = np.unique(trials, return_index=True, return_inverse=True)
+    seeds = first[inverse]
+    seeds[seeds == np.arange(len(trials))] = -1
+    return seeds
+
+
+def fit_warm(
+    params: Params,
+    model: Any,
+    confidence_interval_95: float,
+    x: Any,
+    y: Any,
+    y_errors: Any,
+    results: Any,
+    pending: Any,
+    seeds: Any,
+    stats: dict[str, Any],
+) -> Any:
+    """Fit pending problems in batches, seeding each from the fit of its seed.
+
+    Problems are fit in waves, each wave taking the problems whose seed is already fit.
+    A problem is seeded from the fit of its seed if it has one, and is fit again from
+    the static guesses if the seeded fit diverges. Fits and errors are set in
+    `results`. Returns whether each problem converged.
+    """
+    pending = pending.copy()
+    converged = np.zeros(len(y), dtype=bool)
+    free = len(params.fit.free_params)
+    guesses = np.array(
+        get_guesses(params.fit.free_params, params.fit.initial_values), dtype=float
+    )
+    fit_params = {
+        "model": model,
+        "fixed_values": params.fit.fixed_values,
+        "free_params": params.fit.free_params,
+        "initial_values": params.fit.initial_values,
+        "model_bounds": params.fit.model_bounds,
+        "x": x,
+        "confidence_interval": confidence_interval_95,
+    }
+    has_seed = seeds >= 0
+    while pending.any():
+        ready = np.flatnonzero(pending & ~(has_seed & pending[np.maximum(seeds, 0)]))
+        seed_fits = results[np.maximum(seeds[ready], 0), :free]
+        warm = has_seed[ready] & np.isfinite(seed_fits).all(axis=-1)
+        fits, errors, ready_converged, iterations = fit_batch(
+            **fit_params,
+            y=y[ready],
+            y_errors=y_errors[ready],
+            initial=np.where(warm[:, None], seed_fits, guesses),
+        )
+        # Fit again from static guesses where seeded fits diverged
+        if (retry := warm & ~ready_converged).any():
+            (fits[retry], errors[retry], ready_converged[retry], retry_iterations) = (
+                fit_batch(
+                    **fit_params, y=y[ready[retry]], y_errors=y_errors[ready[retry]]
+                )
+            )
+            iterations[retry] += retry_iterations
+        results[ready] = np.hstack([fits, errors])
+        converged[ready] = ready_converged
+        pending[ready] = False
+        stats["warm_started"] += int(warm.sum())
+        stats["warm_start_fallbacks"] += int(retry.sum())
+        stats["iterations"].extend(iterations.tolist())
+    return converged
+
+
 def fit(
     grp: pd.DataFrame, params: Params, model: Any, confidence_interval_95: float
 ) -> pd.DataFrame:
@@ -114,54 +432,71 @@ def fit_setup(grp: pd.DataFrame, params: Params, trial: Trial):
 
 
 def agg_over_runs(
-    grp: pd.DataFrame, params: Params, confidence_interval_95: float
+    df: pd.DataFrame, params: Params, confidence_interval_95: float
 ) -> pd.DataFrame:
-    """Aggregate properties over each run. Runs per trial because TCs can vary."""
-    trial = get_trial(grp, params)
-    _, tc_errors = get_tcs(trial)
-    grp = (
-        grp.groupby(level=[A.trial, A.run], dropna=False)  # type: ignore  # pandas
-        .agg(
-            **(  # type: ignore  # pandas-stubs 2.0.2
-                # Take the default agg for all cols
-                params.axes.aggs
-                # Override the agg for cols with duplicates in a run to take the first
-                | {
-                    col: pd.NamedAgg(column=col, aggfunc="first")
-                    for col in (tc_errors + params.fit.params_and_errors)
-                }
-            )
+    """Aggregate properties over each run of all trials in a single pass.
+
+    Columns are aggregated together by aggregation function, taking the first value of
+    categorical columns and of columns with duplicates in a run. Thermocouples vary by
+    trial, so errors are only scaled for the thermocouples in the trial of each run.
+    """
+    timestamps = df.index.get_level_values(A.trial).unique()
+    tc_errors = dict(
+        zip(
+            timestamps,
+            params.trial_table["tc_errors"].to_numpy()[
+                params.get_trial_rows(timestamps)
+            ],
+            strict=True,
         )
-        .assign(**{
-            tc_error: lambda df: df[tc_error]  # noqa: B023  # False positive
-            * confidence_interval_95
-            / np.sqrt(params.records_to_average)
-            for tc_error in tc_errors
-        })
     )
-    return grp
+    all_tc_errors = list(dict.fromkeys(chain.from_iterable(tc_errors.values())))
+    # Take the first for cols with duplicates in a run, otherwise the default agg
+    firsts = {*all_tc_errors, *params.fit.params_and_errors}
+    cols_by_agg: dict[Any, list[str]] = {}
+    for col in params.axes.cols:
+        agg = "first" if col.name in firsts or col.dtype == "category" else col.agg
+        cols_by_agg.setdefault(agg, []).append(col.name)
+    runs = df.groupby(level=[A.trial, A.run], dropna=False)  # type: ignore  # pandas
+    aggregated: list[pd.DataFrame] = []
+    for agg, cols in cols_by_agg.items():
+        with time_group(f"agg {getattr(agg, '__name__', agg)}"):
+            aggregated.append(runs[cols].agg(agg))
+    df = pd.concat(axis="columns", objs=aggregated)[
+        [col.name for col in params.axes.cols]
+    ]
+    with time_group("scale thermocouple errors"):
+        trials = df.index.get_level_values(A.trial)
+        is_tc_error = np.column_stack([
+            trials.isin([trial for trial, errors in tc_errors.items() if col in errors])
+            for col in all_tc_errors
+        ])
+        df[all_tc_errors] = np.where(
+            is_tc_error,
+            df[all_tc_errors]
+            * confidence_interval_95
+            / np.sqrt(params.records_to_average),
+            df[all_tc_errors],
+        )
+    return df
 
 
-def get_superheat(df: pd.DataFrame, params: Params) -> pd.DataFrame:
+def get_superheat(df: pd.DataFrame) -> pd.DataFrame:
     """Calculate heat transfer and superheat based on one-dimensional approximation."""
-    # Explicitly index the trial to catch improper application of the mean
-    trial = get_trial(df, params)
+    # Water temperature varies across trials, so take its mean in each trial
     return df.assign(**{
-        A.DT: lambda df: (df[A.T_s] - df.loc[trial.date.isoformat(), A.T_w].mean()),
-        A.DT_err: lambda df: df[A.T_s_err],
+        A.DT: df[A.T_s] - df.groupby(level=A.trial)[A.T_w].transform("mean"),
+        A.DT_err: df[A.T_s_err],
     })
 
 
-def assign_metadata(grp: pd.DataFrame, params: Params) -> pd.DataFrame:
-    """Assign metadata columns to the dataframe."""
-    trial = get_trial(grp, params)
-    # Need to re-apply categorical dtypes
-    grp = grp.assign(**{
-        field: value
-        for field, value in trial.dict().items()  # Dict call avoids excluded properties
-        if field not in [idx.name for idx in params.axes.index]
+def assign_metadata(df: pd.DataFrame, params: Params) -> pd.DataFrame:
+    """Assign metadata columns of each trial, joined from the trial table."""
+    table = params.trial_table.drop(columns=TRIAL_TC_COLS)
+    rows = params.get_trial_rows(df.index.get_level_values(A.trial))
+    return df.assign(**{
+        field: values.to_numpy()[rows] for field, values in table.items()
     })
-    return grp
 
 
 if __name__ == "__main__":
@@ -1,45 +1,182 @@
 """Get runs from all trials."""
 
-from datetime import datetime
+import json
+from collections.abc import Collection, Sequence
+from functools import partial
+from pathlib import Path
+from typing import Any
 
 import pandas as pd
 
-from boilerdata.models.params import PARAMS, Params
-from boilerdata.stages import get_run, set_dtypes
+from boilerdata.axes_enum import AxesEnum as A  # noqa: N814
+from boilerdata.models.params import Params, get_params
+from boilerdata.run_cache import evict_run_cache, get_file_stat
+from boilerdata.stages import (
+    get_run,
+    hash_file,
+    map_in_pool,
+    read_frame,
+    set_dtypes,
+    set_proj_dtypes,
+    write_frame,
+)
 
 
-def main():  # noqa: D103
-    (
-        pd.DataFrame(
-            columns=[ax.name for ax in PARAMS.axes.cols], data=get_runs(PARAMS)
-        ).to_csv(PARAMS.paths.file_runs, encoding="utf-8")
+def main(workers: int | None = None):  # noqa: D103
+    params = get_params()
+    runs, manifest = update_runs(params, workers)
+    write_frame(set_proj_dtypes(runs, params), params.paths.file_runs, params)
+    params.paths.file_runs_manifest.write_text(
+        encoding="utf-8", data=json.dumps(manifest, indent=2)
     )
+    if params.cache_runs:
+        evict_run_cache(params)
 
 
-def get_runs(params: Params) -> pd.DataFrame:
-    """Get runs from all trials."""
+def update_runs(
+    params: Params, workers: int | None = None
+) -> tuple[pd.DataFrame, dict[str, Any]]:
+    """Get runs from all trials, only parsing runs that changed since the last update.
+
+    Compare run file fingerprints against the manifest written with the existing runs,
+    parse the new or changed runs, and splice them into the existing runs. Parse all
+    runs if there are no existing runs or they were produced with different settings.
+    """
+    previous = read_manifest(params.paths.file_runs_manifest)
+    manifest = get_manifest(params, previous)
+    previous_runs = previous.get("runs", {})
+    stale: list[Path] = []
+    stale_indices: set[tuple[pd.Timestamp, pd.Timestamp]] = set()
+    for trial in params.trials:
+        for file, run_index in zip(trial.run_files, trial.run_index, strict=True):
+            key = get_run_key(params, file)
+            if previous_runs.get(key, {}).get("hash") != manifest["runs"][key]["hash"]:
+                stale.append(file)
+                stale_indices.add(run_index)
+    if (
+        not params.paths.file_runs.exists()
+        or get_settings(previous) != get_settings(manifest)
+        or len(stale) == len(manifest["runs"])
+    ):
+        return pd.DataFrame(
+            columns=[ax.name for ax in params.axes.cols], data=get_runs(params, workers)
+        ), manifest
+
+    runs = read_frame(params.paths.file_runs, params)
+    runs = runs[~runs.index.droplevel(A.time).isin(stale_indices)]
+    if stale:
+        runs = pd.concat([
+            runs,
+            pd.DataFrame(
+                columns=[ax.name for ax in params.axes.cols],
+                data=get_runs(params, workers, stale),
+            ),
+        ])
+    # Restore trial and run order, dropping runs whose files are gone
+    frames = dict(list(runs.groupby(level=[A.trial, A.run], sort=False)))
+    return pd.concat([
+        frames[run_index]
+        for trial in params.trials
+        for run_index in trial.run_index
+        if run_index in frames
+    ]), manifest
+
+
+def get_runs(
+    params: Params, workers: int | None = None, runs: Collection[Path] | None = None
+) -> pd.DataFrame:
+    """Get runs from all trials, or just certain run files if `runs` is given.
+
+    Parse run files in a pool of `workers` processes, defaulting to `params.workers`.
+    """
     # Get runs and multiindex
     dtypes = {col.name: col.dtype for col in params.axes.source if not col.index}
-    runs: list[pd.DataFrame] = []
-    multiindex: list[tuple[datetime, datetime, datetime]] = []
+    files: list[Path] = []
+    run_indices: list[tuple[pd.Timestamp, pd.Timestamp]] = []
     for trial in params.trials:
         for file, run_index in zip(trial.run_files, trial.run_index, strict=True):
-            run = get_run(params, file).tail(params.records_to_average)
-            runs.append(run)
-            multiindex.extend(
-                tuple((*run_index, record_time) for record_time in run.index)
-            )
+            if runs is None or file in runs:
+                files.append(file)
+                run_indices.append(run_index)
+    parsed = map_in_pool(
+        partial(get_run, params, records=params.records_to_average),
+        files,
+        params.workers if workers is None else workers,
+    )
+    return concat_runs(parsed, run_indices, params).pipe(set_dtypes, dtypes)
 
-    return (
-        pd.concat(runs)
-        .set_index(
-            pd.MultiIndex.from_tuples(
-                multiindex, names=[idx.name for idx in params.axes.index]
-            )
-        )
-        .pipe(set_dtypes, dtypes)
+
+def concat_runs(
+    runs: Sequence[pd.DataFrame],
+    run_indices: Sequence[tuple[pd.Timestamp, pd.Timestamp]],
+    params: Params,
+) -> pd.DataFrame:
+    """Concatenate runs, keying their records by trial and run in the multiindex.
+
+    The multiindex is built from level codes rather than tuples for each record.
+    """
+    return pd.concat(
+        runs, keys=run_indices, names=[idx.name for idx in params.axes.index]
     )
 
 
+# * -------------------------------------------------------------------------------- * #
+# * MANIFEST
+
+
+def read_manifest(path: Path) -> dict[str, Any]:
+    """Read the manifest of the existing runs, if any."""
+    return json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+
+def get_manifest(params: Params, previous: dict[str, Any]) -> dict[str, Any]:
+    """Get the manifest of settings and run file fingerprints for the current runs."""
+    previous_runs = previous.get("runs", {})
+    return {
+        **get_settings_from_params(params),
+        "runs": {
+            (key := get_run_key(params, file)): get_fingerprint(
+                file, previous_runs.get(key)
+            )
+            for trial in params.trials
+            for file in trial.run_files
+        },
+    }
+
+
+def get_settings_from_params(params: Params) -> dict[str, Any]:
+    """Get settings that the runs depend on, other than the run files themselves."""
+    return {
+        "records_to_average": params.records_to_average,
+        "axes": hash_file(params.paths.axes_config),
+    }
+
+
+def get_settings(manifest: dict[str, Any]) -> dict[str, Any]:
+    """Get settings from a manifest."""
+    return {key: value for key, value in manifest.items() if key != "runs"}
+
+
+def get_run_key(params: Params, run: Path) -> str:
+    """Get the manifest key for a run file."""
+    return run.relative_to(params.paths.trials).as_posix()
+
+
+def get_fingerprint(
+    run: Path, previous: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """Get the size, modification time, and content hash of a run file.
+
+    Only hash the file if its size or modification time differ from the previous
+    fingerprint, otherwise take the previous hash.
+    """
+    fingerprint: dict[str, Any] = get_file_stat(run)
+    if previous and all(
+        previous.get(key) == value for key, value in fingerprint.items()
+    ):
+        return previous
+    return fingerprint | {"hash": hash_file(run)}
+
+
 if __name__ == "__main__":
     main()
@@ -1,122 +1,323 @@
 """Validation."""
 
+import logging
+from collections.abc import Callable
+from functools import cache
+from typing import Any
+
+import numpy as np
 import pandas as pd
 from pandera import Check, Column, DataFrameSchema, Index, MultiIndex
-from pandera.errors import SchemaError
+from pandera.engines.pandas_engine import Engine
 
 from boilerdata.axes_enum import AxesEnum as A  # noqa: N814
-from boilerdata.models.params import PARAMS
+from boilerdata.models.params import get_params
 
-c = {ax.name: ax for ax in PARAMS.axes.all}
+logger = logging.getLogger(__name__)
 
 # * -------------------------------------------------------------------------------- * #
 # * HANDLING AND CHECKS
 
-columns_to_automatically_handle = [*PARAMS.water_temps, A.P]
 water_tc_in_range = Check.in_range(95, 101)  # (C)
 pressure_in_range = Check.in_range(12, 15)  # (psi)
 water_temps_agree = Check.less_than(1.6)  # (C)
 
 # * -------------------------------------------------------------------------------- * #
-# * INDEX AND COLUMNS
-
-initial_index = [
-    Index(name=A.trial, dtype=c[A.trial].dtype),
-    Index(name=A.run, dtype=c[A.run].dtype),
-    Index(name=A.time, dtype=c[A.time].dtype),
-]
+# * COMPILED SCHEMAS
 
-meta_cols = {
-    A.group: Column(c[A.group].dtype),
-    A.rod: Column(c[A.rod].dtype),
-    A.coupon: Column(c[A.coupon].dtype),
-    A.sample: Column(c[A.sample].dtype, nullable=True),
-    A.joint: Column(c[A.joint].dtype),
-    A.good: Column(c[A.good].dtype),
-    A.plot: Column(c[A.plot].dtype),
+compiled_checks: dict[str, Callable[[Any, dict[str, Any]], Any]] = {
+    "in_range": lambda values, stats: (
+        (values >= stats["min_value"])
+        if stats["include_min"]
+        else (values > stats["min_value"])
+    )
+    & (
+        (values <= stats["max_value"])
+        if stats["include_max"]
+        else (values < stats["max_value"])
+    ),
+    "less_than": lambda values, stats: values < stats["max_value"],
+    "less_than_or_equal_to": lambda values, stats: values <= stats["max_value"],
+    "greater_than": lambda values, stats: values > stats["min_value"],
+    "greater_than_or_equal_to": lambda values, stats: values >= stats["min_value"],
 }
+"""Vectorized versions of `pandera` checks, taking values and check statistics."""
 
-runs_cols = {
-    A.V: Column(c[A.V].dtype, nullable=True),  # Not used
-    A.I: Column(c[A.I].dtype, nullable=True),  # Not used
-    A.T_0: Column(c[A.T_0].dtype),
-    A.T_1: Column(c[A.T_1].dtype),
-    A.T_1_err: Column(c[A.T_1_err].dtype, nullable=True),
-    A.T_2: Column(c[A.T_2].dtype),
-    A.T_2_err: Column(c[A.T_2_err].dtype, nullable=True),
-    A.T_3: Column(c[A.T_3].dtype),
-    A.T_3_err: Column(c[A.T_3_err].dtype, nullable=True),
-    A.T_4: Column(c[A.T_4].dtype),
-    A.T_4_err: Column(c[A.T_4_err].dtype, nullable=True),
-    A.T_5: Column(c[A.T_5].dtype),
-    A.T_5_err: Column(c[A.T_5_err].dtype, nullable=True),
-    A.T_w1: Column(c[A.T_w1].dtype, water_tc_in_range),
-    A.T_w2: Column(c[A.T_w2].dtype, water_tc_in_range),
-    A.T_w3: Column(c[A.T_w3].dtype, water_tc_in_range),
-    A.P: Column(c[A.P].dtype, pressure_in_range),
-}
+CompiledColumn = tuple[str, Any, bool, list[tuple[Callable[..., Any], dict[str, Any]]]]
+"""A column name, its dtype, whether it is nullable, and its compiled checks."""
 
 
-# Model fits are nullable because they may not converge. Nullability propagates to other
-# columns downstream.
-model_cols = {
-    col: Column(c[col].dtype, nullable=True) for col in PARAMS.fit.params_and_errors
-}
+class CompiledSchema:
+    """A schema compiled to vectorized checks, reporting failures with `pandera`.
+
+    Dtypes, nullability, and bounds are checked with a single pass over each column. If
+    anything fails, or the schema has features that can't be compiled, the frame is
+    validated by `pandera` instead, which raises a detailed error report.
+    """
+
+    def __init__(self, schema: DataFrameSchema):
+        self.schema = schema
+        self.columns = schema.columns
+        self.compiled = compile_schema(schema)
+
+    def __call__(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Validate a dataframe."""
+        if self.compiled is not None and passes(df, *self.compiled, self.schema.strict):
+            return df
+        return self.schema(df)
+
+
+def compile_schema(
+    schema: DataFrameSchema,
+) -> tuple[list[CompiledColumn], list[CompiledColumn]] | None:
+    """Compile the index and columns of a schema, or `None` if it can't be compiled."""
+    if schema.strict not in [True, False] or any([
+        schema.coerce,
+        schema.checks,
+        schema.unique,
+        schema.ordered,
+        schema.add_missing_columns,
+        schema.drop_invalid_rows,
+    ]):
+        return None
+    index = (
+        []
+        if schema.index is None
+        else schema.index.indexes
+        if isinstance(schema.index, MultiIndex)
+        else [schema.index]
+    )
+    components = [*index, *schema.columns.values()]
+    if any(
+        component.coerce
+        or component.unique
+        or component.drop_invalid_rows
+        or getattr(component, "regex", False)
+        or not getattr(component, "required", True)
+        or any(
+            check.name not in compiled_checks
+            or not check.ignore_na
+            or check.groupby is not None
+            for check in component.checks
+        )
+        for component in components
+    ):
+        return None
+    compiled_index, compiled_columns = (
+        [
+            (
+                component.name,
+                component.dtype,
+                component.nullable,
+                [
+                    (compiled_checks[check.name], check.statistics)
+                    for check in component.checks
+                ],
+            )
+            for component in components
+        ]
+        for components in (index, schema.columns.values())
+    )
+    return compiled_index, compiled_columns
+
+
+def passes(
+    df: pd.DataFrame,
+    index: list[CompiledColumn],
+    columns: list[CompiledColumn],
+    strict: bool,
+) -> bool:
+    """Check whether a dataframe passes a compiled schema."""
+    if not df.columns.is_unique or (
+        set(df.columns) != {name for name, *_ in columns}
+        if strict
+        else not {name for name, *_ in columns} <= set(df.columns)
+    ):
+        return False
+    if index and (
+        df.index.nlevels != len(index)
+        or list(df.index.names) != [name for name, *_ in index]
+    ):
+        return False
+    for i, compiled in enumerate(index):
+        # Checks on the values of a level are at least as strict as on each row
+        if isinstance(df.index, pd.MultiIndex):
+            level = df.index.levels[i]
+            has_nulls = bool((df.index.codes[i] == -1).any())
+        else:
+            level = df.index
+            has_nulls = level.hasnans
+        if not (
+            column_passes(compiled, level.dtype, has_nulls)
+            and checks_pass(compiled, level.to_numpy(), level.isna())
+        ):
+            return False
+    for compiled in columns:
+        ser = df[compiled[0]]
+        nulls = ser.isna().to_numpy()
+        if not (
+            column_passes(compiled, ser.dtype, nulls.any())
+            and checks_pass(compiled, ser.to_numpy(), nulls)
+        ):
+            return False
+    return True
+
+
+def column_passes(compiled: CompiledColumn, dtype: Any, has_nulls: bool) -> bool:
+    """Check the dtype and nullability of a column or index level."""
+    _, expected_dtype, nullable, _ = compiled
+    return (
+        expected_dtype is None or expected_dtype.check(Engine.dtype(dtype)) is True
+    ) and (nullable or not has_nulls)
+
+
+def checks_pass(compiled: CompiledColumn, values: Any, nulls: Any) -> bool:
+    """Check whether non-null values of a column or index level pass their checks."""
+    *_, checks = compiled
+    return all(np.all(check(values, stats) | nulls) for check, stats in checks)
 
-computed_cols = {
-    A.T_w: Column(c[A.T_w].dtype),
-    A.T_w_diff: Column(c[A.T_w_diff].dtype, checks=water_temps_agree),
-    **model_cols,
-    A.DT: Column(c[A.DT].dtype, nullable=True),
-    A.DT_err: Column(c[A.DT_err].dtype, nullable=True),
-}
 
 # * -------------------------------------------------------------------------------- * #
 # * VALIDATION
 
-# We know that `meta_cols | runs_cols | computed_cols` are in the DataFrame, but we
-# don't check for their presence (nor do we specify `strict`) because they're all null
-# right now. We can make sure `model_cols` are here, though.
-validate_initial_df = DataFrameSchema(
-    unique_column_names=True,
-    index=MultiIndex(initial_index),
-    columns=runs_cols | model_cols,
-)
+SCHEMAS = [
+    "columns_to_automatically_handle",
+    "validate_initial_df",
+    "validate_final_df",
+]
+"""Module attributes built from project parameters on first access."""
+
+
+def __getattr__(name: str) -> Any:
+    """Get one of `SCHEMAS`, building them on first access."""
+    if name in SCHEMAS:
+        return get_schemas()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+@cache
+def get_schemas() -> dict[str, Any]:
+    """Get `SCHEMAS`, built from project parameters."""
+    params = get_params()
+    c = {ax.name: ax for ax in params.axes.all}
+
+    # * ---------------------------------------------------------------------------- * #
+    # * INDEX AND COLUMNS
+
+    initial_index = [
+        Index(name=A.trial, dtype=c[A.trial].dtype),
+        Index(name=A.run, dtype=c[A.run].dtype),
+        Index(name=A.time, dtype=c[A.time].dtype),
+    ]
+
+    meta_cols = {
+        A.group: Column(c[A.group].dtype),
+        A.rod: Column(c[A.rod].dtype),
+        A.coupon: Column(c[A.coupon].dtype),
+        A.sample: Column(c[A.sample].dtype, nullable=True),
+        A.joint: Column(c[A.joint].dtype),
+        A.good: Column(c[A.good].dtype),
+        A.plot: Column(c[A.plot].dtype),
+    }
+
+    runs_cols = {
+        A.V: Column(c[A.V].dtype, nullable=True),  # Not used
+        A.I: Column(c[A.I].dtype, nullable=True),  # Not used
+        A.T_0: Column(c[A.T_0].dtype),
+        A.T_1: Column(c[A.T_1].dtype),
+        A.T_1_err: Column(c[A.T_1_err].dtype, nullable=True),
+        A.T_2: Column(c[A.T_2].dtype),
+        A.T_2_err: Column(c[A.T_2_err].dtype, nullable=True),
+        A.T_3: Column(c[A.T_3].dtype),
+        A.T_3_err: Column(c[A.T_3_err].dtype, nullable=True),
+        A.T_4: Column(c[A.T_4].dtype),
+        A.T_4_err: Column(c[A.T_4_err].dtype, nullable=True),
+        A.T_5: Column(c[A.T_5].dtype),
+        A.T_5_err: Column(c[A.T_5_err].dtype, nullable=True),
+        A.T_w1: Column(c[A.T_w1].dtype, water_tc_in_range),
+        A.T_w2: Column(c[A.T_w2].dtype, water_tc_in_range),
+        A.T_w3: Column(c[A.T_w3].dtype, water_tc_in_range),
+        A.P: Column(c[A.P].dtype, pressure_in_range),
+    }
 
-validate_final_df = DataFrameSchema(
-    strict=True,
-    unique_column_names=True,
-    index=MultiIndex(initial_index[:-1]),  # the final index is dropped by now
-    columns=meta_cols | runs_cols | computed_cols,
-)
+    # Model fits are nullable because they may not converge. Nullability propagates to
+    # other columns downstream.
+    model_cols = {
+        col: Column(c[col].dtype, nullable=True) for col in params.fit.params_and_errors
+    }
+
+    computed_cols = {
+        A.T_w: Column(c[A.T_w].dtype),
+        A.T_w_diff: Column(c[A.T_w_diff].dtype, checks=water_temps_agree),
+        **model_cols,
+        A.DT: Column(c[A.DT].dtype, nullable=True),
+        A.DT_err: Column(c[A.DT_err].dtype, nullable=True),
+    }
+
+    # * ---------------------------------------------------------------------------- * #
+    # * SCHEMAS
+
+    return {
+        "columns_to_automatically_handle": [*params.water_temps, A.P],
+        # We know that `meta_cols | runs_cols | computed_cols` are in the DataFrame, but
+        # we don't check for their presence (nor do we specify `strict`) because
+        # they're all null right now. We can make sure `model_cols` are here, though.
+        "validate_initial_df": CompiledSchema(
+            DataFrameSchema(
+                unique_column_names=True,
+                index=MultiIndex(initial_index),
+                columns=runs_cols | model_cols,
+            )
+        ),
+        "validate_final_df": CompiledSchema(
+            DataFrameSchema(
+                strict=True,
+                unique_column_names=True,
+                index=MultiIndex(
+                    initial_index[:-1]
+                ),  # the final index is dropped by now
+                columns=meta_cols | runs_cols | computed_cols,
+            )
+        ),
+    }
 
 
 # * -------------------------------------------------------------------------------- * #
 # * HANDLING
 
 
-def handle_invalid_data(df: pd.DataFrame, validator: DataFrameSchema) -> pd.DataFrame:
-    """Handle invalid data."""
-    validation_error = True
-    while validation_error:
-        try:
-            df = validator(df)
-        except SchemaError as exc:
-            if (
-                # It can be a dataframe with ambiguous existence and truthiness
-                exc.check_output is False
-                or exc.check_output is None
-                # Only handle certain columns
-                or exc.check_output.name not in columns_to_automatically_handle
-            ):
-                raise
-            failed = exc.check_output
-            df = df.assign(**{
-                failed.name: (
-                    lambda df: df[failed.name].where(failed).ffill()  # noqa: B023
-                )
-            })
+def handle_invalid_data(df: pd.DataFrame, validator: CompiledSchema) -> pd.DataFrame:
+    """Handle invalid data.
+
+    Forward-fill values failing checks in `columns_to_automatically_handle`, repairing
+    all of them in one pass, then validate once. The number of values repaired in each
+    column is logged.
+    """
+    repaired: dict[str, pd.Series] = {}  # type: ignore  # pandas
+    for col, passed in get_passed_checks(df, validator).items():
+        if passed.all():
             continue
-        else:
-            validation_error = False
-    return df
+        logger.info(f"Forward-filled {(~passed).sum()} invalid values of {col}.")
+        repaired[col] = df[col].where(passed).ffill()
+    return validator(df.assign(**repaired))
+
+
+def get_passed_checks(
+    df: pd.DataFrame, validator: CompiledSchema
+) -> dict[str, pd.Series]:  # type: ignore  # pandas
+    """Get whether values pass their checks in `columns_to_automatically_handle`.
+
+    Nulls fail unless the column is nullable, so that they are forward-filled too.
+    """
+    passed: dict[str, pd.Series] = {}  # type: ignore  # pandas
+    for col in get_schemas()["columns_to_automatically_handle"]:
+        if col not in validator.columns or col not in df.columns:
+            continue
+        mask = pd.Series(True, index=df.index)
+        for check in validator.columns[col].checks:
+            mask &= check(df[col]).check_output
+        nulls = df[col].isna()
+        passed[col] = (
+            (mask | nulls) if validator.columns[col].nullable else mask & ~nulls
+        )
+    return passed
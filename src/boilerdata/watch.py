@@ -0,0 +1,143 @@
+"""Follow a run while it is being recorded, fitting the model to its latest records.
+
+Run it on an in-progress curve file, e.g. `python -m boilerdata.watch <run>`.
+"""
+
+import re
+from argparse import ArgumentParser
+from collections.abc import Iterator
+from io import BytesIO
+from pathlib import Path
+from time import sleep
+from typing import Any
+
+import pandas as pd
+from scipy.stats import t
+
+from boilerdata.models.params import Params, get_params
+from boilerdata.stages import get_models, read_run, set_proj_dtypes
+from boilerdata.stages.pipeline import fit, get_properties
+from boilerdata.stages.runs import concat_runs
+
+
+def main():  # noqa: D103
+    parser = ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("run", type=Path, help="The run file to follow.")
+    parser.add_argument(
+        "--interval", type=float, default=1.0, help="Seconds between polls."
+    )
+    parser.add_argument(
+        "--idle-timeout", type=float, help="Stop after this many seconds without data."
+    )
+    args = parser.parse_args()
+    params = get_params()
+    cols = [*params.fit.free_params, *params.fit.free_errors]
+    for ser in watch(
+        params, args.run, get_models()[0], args.interval, args.idle_timeout
+    ):
+        print(ser.name[-1], ser[cols].to_dict())  # noqa: T201
+
+
+def watch(
+    params: Params,
+    run: Path,
+    model: Any,
+    interval: float = 1.0,
+    idle_timeout: float | None = None,
+) -> Iterator[pd.Series]:  # type: ignore  # pandas
+    """Follow a growing run file, fitting its latest records whenever more arrive.
+
+    Keep a rolling window of the last `records_to_average` records. Once it fills up,
+    fit the window after each batch of new records and yield its latest record. Only
+    new records are parsed, so each update costs the same no matter how long the run.
+    """
+    follower = RunFollower(params, run)
+    run_index = get_run_index(params, run)
+    confidence_interval_95 = t.interval(0.95, params.records_to_average)[1]
+    window: pd.DataFrame | None = None
+    idle = 0.0
+    while True:
+        records = follower.read()
+        if not records.empty:
+            idle = 0.0
+            window = (records if window is None else pd.concat([window, records])).tail(
+                params.records_to_average
+            )
+            if len(window) == params.records_to_average:
+                yield fit_window(
+                    window, params, model, run_index, confidence_interval_95
+                ).iloc[-1]
+        elif idle_timeout is not None and idle >= idle_timeout:
+            return
+        else:
+            sleep(interval)
+            idle += interval
+
+
+def fit_window(
+    window: pd.DataFrame,
+    params: Params,
+    model: Any,
+    run_index: tuple[pd.Timestamp, pd.Timestamp],
+    confidence_interval_95: float,
+) -> pd.DataFrame:
+    """Fit the model to a window of records, as in the pipeline."""
+    return (
+        pd.DataFrame(
+            columns=[ax.name for ax in params.axes.cols],
+            data=concat_runs([window], [run_index], params),
+        )
+        .pipe(set_proj_dtypes, params)
+        .pipe(get_properties, params)
+        .pipe(fit, params, model, confidence_interval_95)
+    )
+
+
+class RunFollower:
+    """Follow a run file as it grows, parsing only records appended since last read."""
+
+    def __init__(self, params: Params, run: Path):
+        self.params = params
+        self.run = run
+        self.header = b""
+        self.pos = 0
+
+    def read(self) -> pd.DataFrame:
+        """Parse complete records appended since the last read."""
+        with self.run.open("rb") as file:
+            file.seek(self.pos)
+            data = file.read()
+        # Leave a partially-written record for the next read
+        complete = data[: data.rfind(b"\n") + 1]
+        if not complete:
+            return pd.DataFrame()
+        self.pos += len(complete)
+        if not self.header:
+            self.header, _, complete = complete.partition(b"\n")
+            self.header += b"\n"
+            if not complete:
+                return pd.DataFrame()
+        return read_run(self.params, BytesIO(self.header + complete))
+
+
+def get_run_index(params: Params, run: Path) -> tuple[pd.Timestamp, pd.Timestamp]:
+    """Get the trial and run timestamps of a run file, which may be new to `params`.
+
+    Raises `ValueError` if the run time can't be parsed from the file name.
+    """
+    trial = params.get_trial(pd.Timestamp.fromisoformat(run.parent.name))
+    if m := re.match(r"(?P<date>.*)T(?P<time>.*)", run.stem.removeprefix("results_")):
+        try:
+            return (
+                trial.timestamp,
+                pd.Timestamp.fromisoformat(
+                    f"{m['date']}T{m['time'].replace('-', ':')}"
+                ),
+            )
+        except ValueError as exc:
+            raise ValueError(f"Could not parse run time: {run.stem}") from exc
+    raise ValueError(f"Could not parse run time: {run.stem}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Legacy implementations that optimized functions are checked and benchmarked against."""
+
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+def concat_runs_from_tuples(runs, run_indices, params) -> pd.DataFrame:
+    """Concatenate runs as `get_runs` once did, building a tuple for each record."""
+    multiindex: list[tuple[datetime, datetime, datetime]] = []
+    for run, run_index in zip(runs, run_indices, strict=True):
+        multiindex.extend(tuple((*run_index, record_time) for record_time in run.index))
+    return pd.concat(runs).set_index(
+        pd.MultiIndex.from_tuples(
+            multiindex, names=[idx.name for idx in params.axes.index]
+        )
+    )
+
+
+def assign_subtract_mean(grp: pd.DataFrame, params) -> pd.DataFrame:
+    """Subtract the mean of a thermocouple in a group from another thermocouple."""
+    return grp.assign(DT=grp["T_1"] - grp["T_5"].mean())
+
+
+def agg_over_runs_per_trial(grp, params, confidence_interval_95) -> pd.DataFrame:
+    """Aggregate properties over each run of a trial, as `agg_over_runs` once did.
+
+    Unlike the original, each thermocouple error is scaled from its own values, rather
+    than all of them from the last thermocouple error.
+    """
+    from boilerdata.stages import get_tcs, get_trial  # noqa: PLC0415
+
+    _, tc_errors = get_tcs(get_trial(grp, params))
+    return (
+        grp.groupby(level=["trial", "run"], dropna=False)
+        .agg(
+            **(
+                params.axes.aggs
+                | {
+                    col: pd.NamedAgg(column=col, aggfunc="first")
+                    for col in (tc_errors + params.fit.params_and_errors)
+                }
+            )
+        )
+        .assign(**{
+            tc_error: lambda df, tc_error=tc_error: df[tc_error]
+            * confidence_interval_95
+            / np.sqrt(params.records_to_average)
+            for tc_error in tc_errors
+        })
+    )
+
+
+def handle_invalid_data_per_column(df, validator) -> pd.DataFrame:
+    """Handle invalid data as `handle_invalid_data` once did, one column per pass."""
+    from pandera.errors import SchemaError  # noqa: PLC0415
+
+    from boilerdata.validation import columns_to_automatically_handle  # noqa: PLC0415
+
+    while True:
+        try:
+            return validator(df)
+        except SchemaError as exc:
+            if (
+                exc.check_output is False
+                or exc.check_output is None
+                or exc.check_output.name not in columns_to_automatically_handle
+            ):
+                raise
+            failed = exc.check_output
+            df = df.assign(**{failed.name: df[failed.name].where(failed).ffill()})
+
+
+def get_benchmarks_serially(params) -> pd.DataFrame:
+    """Get the 90% rise of all benchmarks, parsing each whole benchmark in turn."""
+    from boilerdata.stages import get_run  # noqa: PLC0415
+    from boilerdata.stages.parse_benchmarks import parse_benchmark  # noqa: PLC0415
+
+    return pd.concat([
+        get_run(params, benchmark).pipe(parse_benchmark, params)
+        for benchmark in sorted(Path(params.paths.benchmarks).glob("*.csv"))
+    ])
@@ -0,0 +1,118 @@
+"""Synthetic projects and trials for tests and benchmarks."""
+
+import json
+from collections.abc import Sequence
+from copy import deepcopy
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from boilercore.models.trials import Trials
+
+MISSING_PATTERNS: dict[str, list[list[str]]] = {
+    "complete": [[]],
+    "missing": [[], ["T_2"], ["T_4", "T_5"]],
+}
+"""Thermocouples missing from the curve files of each trial, cycled over trials."""
+
+
+def get_synthetic_project(
+    params,
+    root: Path,
+    trials: int,
+    runs: int,
+    records: int,
+    missing: Sequence[Sequence[str]] = ((),),
+):
+    """Write synthetic curve files and trials config, and get parameters for them.
+
+    Records of each run are sampled from the first run of the first trial, with noise
+    added. Thermocouples in `missing` are cycled over trials and dropped from their
+    curve files. Parameters are copied from `params`, with the trials config, curves
+    and run cache under `root`.
+    """
+    rng = np.random.default_rng(0)
+    template_trial = params.trials[0]
+    template = pd.read_csv(template_trial.run_files[0], index_col=0)
+    sources = {col.name: col.source for col in params.axes.source_cols}
+    curves = root / "curves"
+    entries = []
+    for trial_num in range(trials):
+        date = template_trial.date + timedelta(days=trial_num)
+        trial_path = curves / date.isoformat()
+        trial_path.mkdir(parents=True)
+        dropped = [sources[tc] for tc in missing[trial_num % len(missing)]]
+        for run_num in range(runs):
+            start = pd.Timestamp(date) + pd.Timedelta(seconds=(records + 60) * run_num)
+            df = template.iloc[rng.integers(len(template), size=records)] + rng.normal(
+                scale=0.01, size=(records, len(template.columns))
+            )
+            df.index = pd.date_range(
+                start, periods=records, freq="s", name=template.index.name
+            )
+            df.drop(columns=dropped).to_csv(
+                trial_path / f"results_{start:%Y-%m-%dT%H-%M-%S}.csv",
+                date_format="%Y-%m-%dT%H:%M:%S.%f",
+                encoding="utf-8",
+            )
+        entries.append({"date": date.isoformat(), **template_trial.dict()})
+    trials_config = root / "trials.yaml"
+    # JSON is also YAML
+    trials_config.write_text(
+        encoding="utf-8", data=json.dumps({"trials": entries}, indent=2)
+    )
+
+    synthetic = deepcopy(params)
+    synthetic.paths = params.paths.copy(
+        update={
+            "trials": curves,
+            "trials_config": trials_config,
+            "run_cache": root / "cache" / "runs",
+        }
+    )
+    synthetic.paths.run_cache.mkdir(parents=True)
+    synthetic.trials = Trials(trials_config).trials
+    for trial in synthetic.trials:
+        trial.setup(synthetic.paths, synthetic.geometry, synthetic.copper_temps)
+    synthetic._trial_table = synthetic.get_trial_table()
+    return synthetic
+
+
+def get_synthetic_trials(params, trials: int) -> pd.DataFrame:
+    """Get synthetic runs by repeating the test runs for several trials."""
+    from boilerdata.stages import read_frame  # noqa: PLC0415
+
+    runs = read_frame(params.paths.file_runs, params)
+    return pd.concat([
+        runs.set_index(
+            runs.index.set_levels(
+                runs.index.levels[0] + pd.Timedelta(days=day), level=0
+            )
+        )
+        for day in range(trials)
+    ])
+
+
+def get_synthetic_trial_models(params, trials: int) -> list:
+    """Get copies of the test trial for each day of synthetic trials."""
+    synthetic_trials = []
+    for day in range(trials):
+        trial = deepcopy(params.trials[0])
+        trial.date += pd.Timedelta(days=day)
+        synthetic_trials.append(trial)
+    return synthetic_trials
+
+
+def get_synthetic_invalid_trials(params, trials: int) -> pd.DataFrame:
+    """Get synthetic trials with out-of-range values in automatically-handled columns."""
+    from boilerdata.validation import columns_to_automatically_handle  # noqa: PLC0415
+
+    df = get_synthetic_trials(params, trials)
+    rng = np.random.default_rng(0)
+    for col in columns_to_automatically_handle:
+        df.iloc[
+            np.sort(rng.choice(np.arange(1, len(df)), len(df) // 10, replace=False)),
+            df.columns.get_loc(col),
+        ] = 0
+    return df
@@ -0,0 +1,344 @@
+"""Benchmarks."""
+
+import json
+import subprocess
+import sys
+from copy import deepcopy
+from functools import partial
+from pathlib import Path
+from timeit import timeit
+from typing import Any
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from boilerdata_tests import stages
+from boilerdata_tests.legacy import (
+    agg_over_runs_per_trial,
+    concat_runs_from_tuples,
+    get_benchmarks_serially,
+    handle_invalid_data_per_column,
+)
+from boilerdata_tests.synthetic import (
+    MISSING_PATTERNS,
+    get_synthetic_invalid_trials,
+    get_synthetic_project,
+    get_synthetic_trial_models,
+    get_synthetic_trials,
+)
+
+RUNS = 100
+"""Number of synthetic runs to benchmark."""
+
+CONFIDENCE_INTERVAL_95 = 2.26
+"""Confidence interval for scaling errors in benchmarks."""
+
+RUNS_PER_TRIAL = 10
+"""Number of runs in each trial of synthetic projects."""
+
+RECORDS = 100
+"""Number of records in each run of synthetic projects."""
+
+
+def get_synthetic_runs(
+    params, records: int
+) -> tuple[list[pd.DataFrame], list[tuple[pd.Timestamp, pd.Timestamp]]]:
+    """Get synthetic runs shaped like those from `get_run`, and their run indices."""
+    rng = np.random.default_rng(0)
+    cols = [col.name for col in params.axes.source_cols]
+    trial = pd.Timestamp("2022-09-14")
+    runs: list[pd.DataFrame] = []
+    run_indices: list[tuple[pd.Timestamp, pd.Timestamp]] = []
+    for run in pd.date_range(trial, periods=RUNS, freq="h"):
+        runs.append(
+            pd.DataFrame(
+                index=pd.date_range(run, periods=records, freq="s", name="time"),
+                columns=cols,
+                data=rng.random((records, len(cols))),
+            )
+        )
+        run_indices.append((trial, run))
+    return runs, run_indices
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("records", [10, 100, 1_000])
+@pytest.mark.parametrize("from_tuples", [False, True], ids=["codes", "tuples"])
+def test_concat_runs(benchmark, params, records, from_tuples):
+    """Benchmark multiindex construction when concatenating runs."""
+    from boilerdata.stages.runs import concat_runs  # noqa: PLC0415
+
+    runs, run_indices = get_synthetic_runs(params, records)
+    benchmark.group = f"concat_runs, {RUNS} runs of {records} records"
+    benchmark(
+        concat_runs_from_tuples if from_tuples else concat_runs,
+        runs,
+        run_indices,
+        params,
+    )
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("trials", [10, 100])
+@pytest.mark.parametrize("single_pass", [False, True], ids=["per_trial", "single"])
+def test_agg_over_runs(benchmark, params, monkeypatch, trials, single_pass):
+    """Benchmark aggregating properties over each run."""
+    from boilerdata.stages import per_trial  # noqa: PLC0415
+    from boilerdata.stages.pipeline import agg_over_runs  # noqa: PLC0415
+
+    monkeypatch.setattr(params, "trials", get_synthetic_trial_models(params, trials))
+    monkeypatch.setattr(params, "_trial_table", params.get_trial_table())
+    df = get_synthetic_trials(params, trials)
+    benchmark.group = f"agg_over_runs, {trials} trials"
+    benchmark(
+        *(
+            (agg_over_runs, df, params, CONFIDENCE_INTERVAL_95)
+            if single_pass
+            else (
+                per_trial,
+                df,
+                agg_over_runs_per_trial,
+                params,
+                CONFIDENCE_INTERVAL_95,
+            )
+        )
+    )
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("trials", [10, 100])
+@pytest.mark.parametrize("one_pass", [False, True], ids=["per_column", "one_pass"])
+def test_handle_invalid_data(benchmark, params, trials, one_pass):
+    """Benchmark repairing out-of-range values."""
+    from boilerdata.validation import (  # noqa: PLC0415
+        handle_invalid_data,
+        validate_initial_df,
+    )
+
+    df = get_synthetic_invalid_trials(params, trials)
+    benchmark.group = f"handle_invalid_data, {trials} trials"
+    benchmark(
+        handle_invalid_data if one_pass else handle_invalid_data_per_column,
+        df,
+        validate_initial_df,
+    )
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("trials", [10, 100])
+@pytest.mark.parametrize("compiled", [False, True], ids=["pandera", "compiled"])
+def test_validate(benchmark, params, trials, compiled):
+    """Benchmark validating the initial frame."""
+    from boilerdata.validation import validate_initial_df  # noqa: PLC0415
+
+    df = get_synthetic_trials(params, trials)
+    benchmark.group = f"validate_initial_df, {trials} trials"
+    benchmark(validate_initial_df if compiled else validate_initial_df.schema, df)
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("stage", stages)
+def test_import_stage(benchmark, stage):
+    """Benchmark importing a stage in a fresh interpreter."""
+    benchmark.group = "import stage"
+    benchmark(
+        subprocess.run, check=True, args=[sys.executable, "-c", f"import {stage}"]
+    )
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("records", [1_000, 10_000])
+@pytest.mark.parametrize("cached", [False, True], ids=["parse", "cached"])
+def test_get_run(benchmark, params, tmp_path, records, cached):
+    """Benchmark getting a run."""
+    from boilerdata.stages import get_run  # noqa: PLC0415
+
+    synthetic = get_synthetic_project(params, tmp_path, 1, 1, records)
+    synthetic.cache_runs = cached
+    run = synthetic.trials[0].run_files[0]
+    get_run(synthetic, run)
+    benchmark.group = f"get_run, {records} records"
+    benchmark(get_run, synthetic, run)
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("trials", [1, 10])
+@pytest.mark.parametrize("missing", MISSING_PATTERNS)
+def test_get_runs(benchmark, params, tmp_path, trials, missing):
+    """Benchmark getting the runs of all trials."""
+    from boilerdata.stages.runs import get_runs  # noqa: PLC0415
+
+    synthetic = get_synthetic_project(
+        params, tmp_path, trials, RUNS_PER_TRIAL, RECORDS, MISSING_PATTERNS[missing]
+    )
+    synthetic.cache_runs = False
+    benchmark.group = f"get_runs, {trials} trials of {RUNS_PER_TRIAL} runs"
+    benchmark(get_runs, synthetic, 1)
+
+
+def get_synthetic_runs_frame(
+    params, tmp_path, trials: int, runs: int = RUNS_PER_TRIAL
+) -> tuple[Any, pd.DataFrame]:
+    """Get parameters for a synthetic project and the runs of all its trials."""
+    from boilerdata.stages import set_proj_dtypes  # noqa: PLC0415
+    from boilerdata.stages.runs import get_runs  # noqa: PLC0415
+
+    synthetic = get_synthetic_project(params, tmp_path, trials, runs, RECORDS)
+    df = pd.DataFrame(
+        columns=[ax.name for ax in synthetic.axes.cols], data=get_runs(synthetic, 1)
+    ).pipe(set_proj_dtypes, synthetic)
+    return synthetic, df
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("trials", [1, 10])
+def test_get_properties(benchmark, params, tmp_path, trials):
+    """Benchmark getting properties."""
+    from boilerdata.stages.pipeline import get_properties  # noqa: PLC0415
+
+    synthetic, df = get_synthetic_runs_frame(params, tmp_path, trials)
+    benchmark.group = f"get_properties, {trials} trials of {RUNS_PER_TRIAL} runs"
+    benchmark(get_properties, df, synthetic)
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("trials", [1, 10])
+@pytest.mark.parametrize("engine", ["per_run", "updates", "batched"])
+def test_fit(benchmark, params, tmp_path, trials, engine):
+    """Benchmark fitting the model to each run."""
+    from boilerdata.stages import get_models, per_run, per_run_updates  # noqa: PLC0415
+    from boilerdata.stages.pipeline import (  # noqa: PLC0415
+        fit,
+        fit_runs,
+        get_fit_updates,
+        get_properties,
+    )
+
+    synthetic, df = get_synthetic_runs_frame(params, tmp_path, trials)
+    synthetic.cache_fits = False
+    df = get_properties(df, synthetic)
+    model, _ = get_models()
+    benchmark.group = f"fit, {trials} trials of {RUNS_PER_TRIAL} runs"
+    benchmark(
+        *{
+            "per_run": (per_run, df, fit, synthetic, model, CONFIDENCE_INTERVAL_95),
+            "updates": (
+                per_run_updates,
+                df,
+                get_fit_updates,
+                synthetic,
+                model,
+                CONFIDENCE_INTERVAL_95,
+            ),
+            "batched": (fit_runs, df, synthetic, model, CONFIDENCE_INTERVAL_95),
+        }[engine]
+    )
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize(
+    ("trials", "runs"), [(1, 1), (1, 3), (1, RUNS_PER_TRIAL), (10, RUNS_PER_TRIAL)]
+)
+def test_fit_runs_not_slower(params, tmp_path, trials, runs):
+    """Fitting runs is not slower than fitting each run individually."""
+    from boilerdata.stages import get_models, per_run  # noqa: PLC0415
+    from boilerdata.stages.pipeline import (  # noqa: PLC0415
+        fit,
+        fit_runs,
+        get_properties,
+    )
+
+    synthetic, df = get_synthetic_runs_frame(params, tmp_path, trials, runs)
+    synthetic.cache_fits = False
+    df = get_properties(df, synthetic)
+    model, _ = get_models()
+    funcs = (
+        partial(fit_runs, df, synthetic, model, CONFIDENCE_INTERVAL_95),
+        partial(per_run, df, fit, synthetic, model, CONFIDENCE_INTERVAL_95),
+    )
+    # Alternate timings so that both see the same machine load
+    times = np.array([[timeit(func, number=1) for func in funcs] for _ in range(7)])
+    batched, individual = times.min(axis=0)
+    # Allow for timing noise where both fit individually
+    assert batched <= 1.2 * individual
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("records", [1_000, 100_000])
+def test_parse_benchmark(benchmark, params, records):
+    """Benchmark finding the 90% rise of a benchmark run."""
+    from boilerdata.stages.parse_benchmarks import parse_benchmark  # noqa: PLC0415
+
+    rng = np.random.default_rng(0)
+    rise = 1 / (1 + np.exp(-np.linspace(-10, 10, records)))
+    df = pd.DataFrame(
+        index=pd.date_range("2022-11-21", periods=records, freq="s", name="time"),
+        data={
+            col: 25 + 75 * rise + rng.normal(scale=0.1, size=records)
+            for col in ["T_0", *params.copper_temps]
+        },
+    )
+    benchmark.group = f"parse_benchmark, {records} records"
+    benchmark(parse_benchmark, df, params)
+
+
+BENCHMARKS = 10
+"""Number of synthetic benchmark files to parse."""
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("repeats", [1, 20])
+@pytest.mark.parametrize("workers", [1, 2])
+@pytest.mark.parametrize("whole", [True, False], ids=["whole", "seek"])
+def test_get_benchmarks(benchmark, params, tmp_path, repeats, workers, whole):
+    """Benchmark getting the 90% rise of all benchmarks.
+
+    Benchmark files are copied from the project, with their records repeated.
+    """
+    from boilerdata.stages.parse_benchmarks import get_benchmarks  # noqa: PLC0415
+
+    if workers > 1 and whole:
+        pytest.skip("Parsing whole benchmarks is only done serially.")
+    sources = sorted(Path(params.paths.benchmarks).glob("*.csv"))
+    for num in range(BENCHMARKS):
+        header, *records = (
+            sources[num % len(sources)].read_text(encoding="utf-8").splitlines()
+        )
+        (tmp_path / f"benchmark_{num:03}.csv").write_text(
+            encoding="utf-8", data="\n".join([header, *records * repeats])
+        )
+    synthetic = deepcopy(params)
+    synthetic.paths = params.paths.copy(update={"benchmarks": tmp_path})
+    synthetic.cache_runs = False
+    benchmark.group = f"get_benchmarks, {BENCHMARKS} benchmarks, {repeats}x records"
+    if whole:
+        benchmark(get_benchmarks_serially, synthetic)
+    else:
+        benchmark(get_benchmarks, synthetic, workers)
+
+
+@pytest.mark.slow()
+@pytest.mark.parametrize("points", [100, 10_000])
+def test_get_literature_data(benchmark, tmp_path, points):
+    """Benchmark getting data from a Web Plot Digitizer project."""
+    from boilerdata.stages.literature import get_data  # noqa: PLC0415
+
+    rng = np.random.default_rng(0)
+    project = tmp_path / "wpd_project.json"
+    project.write_text(
+        encoding="utf-8",
+        data=json.dumps({
+            "datasetColl": [
+                {
+                    "name": f"dataset_{dataset}",
+                    "data": [
+                        {"value": value} for value in rng.random((points, 2)).tolist()
+                    ],
+                }
+                for dataset in range(10)
+            ]
+        }),
+    )
+    benchmark.group = f"literature.get_data, 10 datasets of {points} points"
+    benchmark(get_data, project)
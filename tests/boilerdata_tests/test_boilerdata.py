@@ -1,6 +1,31 @@
 """Tests."""
 
+import json
+import logging
+import subprocess
+import sys
+from os import utime
+from pathlib import Path
+
+import dill
+import numpy as np
+import pandas as pd
 import pytest
+from pandas.testing import assert_frame_equal, assert_series_equal
+from scipy.stats import t
+
+from boilerdata_tests import stages
+from boilerdata_tests.legacy import (
+    agg_over_runs_per_trial,
+    assign_subtract_mean,
+    get_benchmarks_serially,
+    handle_invalid_data_per_column,
+)
+from boilerdata_tests.synthetic import (
+    MISSING_PATTERNS,
+    get_synthetic_invalid_trials,
+    get_synthetic_project,
+)
 
 
 @pytest.mark.slow()
@@ -13,3 +38,672 @@ def test_execute_nb(nb_client_to_execute):
 def test_stage(main):
     """Test a stage."""
     main()
+
+
+@pytest.mark.parametrize("records", [1, 9, 100])
+def test_get_run_tail(params, records):
+    """Seeking from the end of a run gets the same records as parsing all of it."""
+    from boilerdata.stages import get_run  # noqa: PLC0415
+
+    for trial in params.trials:
+        for run in trial.run_files:
+            assert_frame_equal(
+                get_run(params, run, records), get_run(params, run).tail(records)
+            )
+
+
+@pytest.mark.parametrize("records", [None, 9])
+def test_get_run_pyarrow(params, monkeypatch, records):
+    """The PyArrow engine gets the same records as the default engine."""
+    from boilerdata.stages import get_run  # noqa: PLC0415
+
+    monkeypatch.setattr(params, "cache_runs", False)
+    for trial in params.trials:
+        for run in trial.run_files:
+            expected = get_run(params, run, records)
+            with monkeypatch.context() as m:
+                m.setattr(params, "csv_engine", "pyarrow")
+                assert_frame_equal(get_run(params, run, records), expected)
+
+
+@pytest.mark.parametrize("records", [None, 9])
+def test_get_run_cache(params, monkeypatch, records):
+    """Cached runs are mapped from the run cache and match freshly-parsed runs."""
+    from boilerdata import stages  # noqa: PLC0415
+
+    run = params.trials[0].run_files[0]
+    expected = stages.parse_run(params, run, records)
+    assert_frame_equal(stages.get_run(params, run, records), expected)
+    monkeypatch.setattr(stages, "parse_run", None)
+    assert_frame_equal(stages.get_run(params, run, records), expected)
+
+
+def test_run_cache(params, monkeypatch):
+    """Runs are cached by file fingerprint and parser, and evicted beyond a size."""
+    from boilerdata import run_cache  # noqa: PLC0415
+    from boilerdata.stages import get_run  # noqa: PLC0415
+
+    runs = [run for trial in params.trials for run in trial.run_files]
+    run_cache.clear_run_cache(params)
+    for run in runs:
+        get_run(params, run)
+    info = run_cache.get_run_cache_info(params)
+    assert info["entries"] == len(runs)
+    key = run_cache.get_run_cache_key(params, runs[0], None)
+    stat = runs[0].stat()
+    try:
+        utime(runs[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        assert run_cache.get_run_cache_key(params, runs[0], None) != key
+    finally:
+        utime(runs[0], ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    # Runs parsed by another engine or by changed parsers aren't reused
+    with monkeypatch.context() as m:
+        m.setattr(params, "csv_engine", "pyarrow")
+        assert run_cache.get_run_cache_key(params, runs[0], None) != key
+    with monkeypatch.context() as m:
+        m.setattr(run_cache, "get_parsers_hash", lambda: "changed")
+        assert run_cache.get_run_cache_key(params, runs[0], None) != key
+    monkeypatch.setattr(params, "run_cache_max_bytes", info["bytes"] // 2)
+    run_cache.evict_run_cache(params)
+    assert run_cache.get_run_cache_info(params)["bytes"] <= info["bytes"] // 2
+
+
+def test_get_saturation_temp():
+    """Saturation temperatures match exact lookups within and outside of the band."""
+    from pyXSteam.XSteam import XSteam  # noqa: PLC0415
+    from scipy.constants import convert_temperature  # noqa: PLC0415
+
+    from boilerdata.properties import get_saturation_temp  # noqa: PLC0415
+
+    pressures = np.append(np.linspace(5, 25, 1001), np.linspace(5, 25, 11))
+    tsat_p = XSteam(XSteam.UNIT_SYSTEM_FLS).tsat_p
+    np.testing.assert_allclose(
+        get_saturation_temp(pressures),
+        convert_temperature([tsat_p(p) for p in pressures], "F", "C"),
+        rtol=0,
+        atol=1e-7,
+    )
+
+
+def test_get_copper_conductivity(params):
+    """Copper conductivity is interpolated from the `propshop` table."""
+    from scipy.interpolate import interp1d  # noqa: PLC0415
+
+    from boilerdata.properties import (  # noqa: PLC0415
+        COPPER_TABLE,
+        get_copper_conductivity,
+    )
+
+    source = pd.read_feather(params.paths.propshop / COPPER_TABLE).dropna()
+    temperatures = np.linspace(300, 400, 101)
+    np.testing.assert_array_equal(
+        get_copper_conductivity(params, temperatures),
+        interp1d(source["TEMPERATURE"], source["THERMAL_CONDUCTIVITY"])(temperatures),
+    )
+    with pytest.raises(ValueError, match="out of range"):
+        get_copper_conductivity(params, [-1.0])
+
+
+def test_get_runs_workers(params):
+    """Parsing runs in a process pool gets the same result as parsing serially."""
+    from boilerdata.stages.runs import get_runs  # noqa: PLC0415
+
+    assert_frame_equal(get_runs(params, workers=2), get_runs(params, workers=1))
+
+
+def test_runs_incremental(params, monkeypatch):
+    """Only new or changed runs are parsed, and are spliced into the existing runs."""
+    from boilerdata.stages import read_frame, runs  # noqa: PLC0415
+
+    runs.main()
+    expected = read_frame(params.paths.file_runs, params)
+    manifest = runs.read_manifest(params.paths.file_runs_manifest)
+    new = params.trials[0].run_files[1]
+    del manifest["runs"][runs.get_run_key(params, new)]
+    params.paths.file_runs_manifest.write_text(
+        encoding="utf-8", data=runs.json.dumps(manifest)
+    )
+    parsed: list[Path] = []
+    get_run = runs.get_run
+
+    def get_run_and_record(params, run, *args, **kwargs):
+        parsed.append(run)
+        return get_run(params, run, *args, **kwargs)
+
+    monkeypatch.setattr(runs, "get_run", get_run_and_record)
+    runs.main()
+    assert parsed == [new]
+    assert_frame_equal(read_frame(params.paths.file_runs, params), expected)
+
+
+@pytest.mark.parametrize("csv_engine", ["c", "pyarrow"])
+def test_get_benchmarks(params, monkeypatch, csv_engine):
+    """Parsing only needed columns of benchmarks in a pool matches parsing them all."""
+    from boilerdata.stages.parse_benchmarks import get_benchmarks  # noqa: PLC0415
+
+    monkeypatch.setattr(params, "csv_engine", csv_engine)
+    assert_frame_equal(get_benchmarks(params, 2), get_benchmarks_serially(params))
+
+
+@pytest.mark.parametrize("chunk_size", [256, 2**16])
+def test_get_benchmark(params, chunk_size):
+    """Seeking to the rise of a benchmark matches finding it in the whole run."""
+    from boilerdata.stages import get_run  # noqa: PLC0415
+    from boilerdata.stages.parse_benchmarks import (  # noqa: PLC0415
+        get_benchmark,
+        parse_benchmark,
+    )
+
+    for benchmark in Path(params.paths.benchmarks).glob("*.csv"):
+        assert_frame_equal(
+            get_benchmark(params, benchmark, chunk_size),
+            get_run(params, benchmark).pipe(parse_benchmark, params),
+        )
+
+
+def test_fit_runs(params):
+    """Batched fits match fitting each run individually."""
+    from boilerdata.stages import (  # noqa: PLC0415
+        MODEL,
+        per_run,
+        read_frame,
+        set_proj_dtypes,
+    )
+    from boilerdata.stages.pipeline import (  # noqa: PLC0415
+        fit,
+        fit_runs,
+        get_properties,
+    )
+
+    df = read_frame(params.paths.file_runs, params).pipe(get_properties, params)
+    confidence_interval_95 = t.interval(0.95, params.records_to_average)[1]
+    assert_frame_equal(
+        fit_runs(df, params, MODEL, confidence_interval_95).pipe(
+            set_proj_dtypes, params
+        ),
+        per_run(df, fit, params, MODEL, confidence_interval_95),
+        rtol=1e-4,
+    )
+
+
+def test_fit_runs_small_batch(params):
+    """Runs in batches smaller than the minimum are fit individually."""
+    from boilerdata.stages import (  # noqa: PLC0415
+        MODEL,
+        per_run,
+        read_frame,
+        set_proj_dtypes,
+    )
+    from boilerdata.stages.pipeline import (  # noqa: PLC0415
+        MIN_BATCH_SIZE,
+        fit,
+        fit_runs,
+        get_properties,
+    )
+
+    df = read_frame(params.paths.file_runs, params).pipe(get_properties, params)
+    runs = df.index.droplevel("time").unique()[: MIN_BATCH_SIZE - 1]
+    df = df[df.index.droplevel("time").isin(runs)]
+    confidence_interval_95 = t.interval(0.95, params.records_to_average)[1]
+    stats = {}
+    result = fit_runs(df, params, MODEL, confidence_interval_95, stats)
+    assert stats["individual_fits"] == len(runs) - stats["cached"]
+    assert_frame_equal(
+        result.pipe(set_proj_dtypes, params),
+        per_run(df, fit, params, MODEL, confidence_interval_95),
+        rtol=1e-4,
+    )
+
+
+@pytest.mark.parametrize("cache_fits", [False, True], ids=["per_run", "individual"])
+def test_fit_runs_workers(params, monkeypatch, cache_fits):
+    """Runs fit individually are fit in a process pool if there are multiple workers."""
+    from boilerdata import fit_cache, stages  # noqa: PLC0415
+    from boilerdata.stages import MODEL, per_run, pipeline, read_frame  # noqa: PLC0415
+
+    df = read_frame(params.paths.file_runs, params).pipe(
+        pipeline.get_properties, params
+    )
+    runs = df.groupby(level=["trial", "run"]).ngroups
+    confidence_interval_95 = t.interval(0.95, params.records_to_average)[1]
+    expected = per_run(df, pipeline.fit, params, MODEL, confidence_interval_95)
+    monkeypatch.setattr(params, "cache_fits", cache_fits)
+    fit_cache.clear_fit_cache(params)
+    # Fit all runs individually, either by `per_run` or in the loop over batches
+    monkeypatch.setattr(pipeline, "MIN_BATCH_SIZE", runs + 1)
+    monkeypatch.setattr(params, "workers", 2)
+    pools = []
+
+    class RecordedPoolExecutor(stages.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(kwargs["max_workers"])
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(stages, "ProcessPoolExecutor", RecordedPoolExecutor)
+    stats = {}
+    result = pipeline.fit_runs(df, params, MODEL, confidence_interval_95, stats)
+    assert pools == [2]
+    assert stats["individual_fits"] == runs
+    assert_frame_equal(result.pipe(stages.set_proj_dtypes, params), expected)
+
+
+def test_fit_runs_warm_start(params, monkeypatch):
+    """Warm-started fits match fits from static guesses, and are fit in two waves."""
+    from boilerdata.fits import fit_batch  # noqa: PLC0415
+    from boilerdata.stages import MODEL, pipeline, read_frame  # noqa: PLC0415
+    from boilerdata.stages.pipeline import get_properties  # noqa: PLC0415
+
+    monkeypatch.setattr(params, "cache_fits", False)
+    monkeypatch.setattr(params, "warm_start_fits", True)
+    df = read_frame(params.paths.file_runs, params).pipe(get_properties, params)
+    confidence_interval_95 = t.interval(0.95, params.records_to_average)[1]
+    stats = {}
+    batches = []
+
+    def record_batch(*args, **kwargs):
+        batches.append(len(kwargs["y"]))
+        return fit_batch(*args, **kwargs)
+
+    with monkeypatch.context() as m:
+        m.setattr(pipeline, "fit_batch", record_batch)
+        result = pipeline.fit_runs(df, params, MODEL, confidence_interval_95, stats)
+    # Runs are seeded from the first run in their trial, in a wave after it
+    assert batches == [len(params.trials), stats["runs"] - len(params.trials)]
+    assert stats["warm_started"] == stats["runs"] - len(params.trials)
+    assert stats["iterations_mean"] > 0
+    monkeypatch.setattr(params, "warm_start_fits", False)
+    assert_frame_equal(
+        result, pipeline.fit_runs(df, params, MODEL, confidence_interval_95), rtol=1e-4
+    )
+
+
+def test_fit_cache(params, monkeypatch):
+    """Cached fits are reused for the same data, and evicted beyond the maximum size."""
+    from boilerdata import fit_cache  # noqa: PLC0415
+    from boilerdata.stages import MODEL, pipeline, read_frame  # noqa: PLC0415
+
+    confidence_interval_95 = t.interval(0.95, params.records_to_average)[1]
+    df = read_frame(params.paths.file_runs, params).pipe(
+        pipeline.get_properties, params
+    )
+    fit_cache.clear_fit_cache(params)
+    expected = pipeline.fit_runs(df, params, MODEL, confidence_interval_95)
+    info = fit_cache.get_fit_cache_info(params)
+    assert info["entries"] == df.groupby(level=["trial", "run"]).ngroups
+    with monkeypatch.context() as m:
+        m.setattr(pipeline, "fit_batch", None)
+        assert_frame_equal(
+            pipeline.fit_runs(df, params, MODEL, confidence_interval_95), expected
+        )
+    # Fits aren't reused across seed modes
+    monkeypatch.setattr(params, "warm_start_fits", not params.warm_start_fits)
+    stats = {}
+    pipeline.fit_runs(df, params, MODEL, confidence_interval_95, stats)
+    assert not stats["cached"]
+    monkeypatch.setattr(params, "fit_cache_max_bytes", info["bytes"] // 2)
+    fit_cache.evict_fit_cache(params)
+    assert fit_cache.get_fit_cache_info(params)["bytes"] <= info["bytes"] // 2
+
+
+def test_per_run_workers(params):
+    """Applying per run in a process pool gets the same result as applying serially."""
+    from boilerdata.stages import MODEL, per_run, read_frame  # noqa: PLC0415
+    from boilerdata.stages.pipeline import fit, get_properties  # noqa: PLC0415
+
+    confidence_interval_95 = t.interval(0.95, params.records_to_average)[1]
+    df = read_frame(params.paths.file_runs, params).pipe(get_properties, params)
+    assert_frame_equal(
+        per_run(df, fit, params, MODEL, confidence_interval_95, workers=2),
+        per_run(df, fit, params, MODEL, confidence_interval_95),
+    )
+
+
+def test_per_run_updates(params):
+    """Applying column updates to sorted runs matches assigning them to each run."""
+    from boilerdata.stages import (  # noqa: PLC0415
+        per_run,
+        per_run_updates,
+        read_frame,
+        set_proj_dtypes,
+    )
+
+    def subtract_mean(grp, params):
+        return {"DT": grp["T_1"] - grp["T_5"].mean()}
+
+    df = read_frame(params.paths.file_runs, params)
+    expected = per_run(df, assign_subtract_mean, params)
+    for workers in [1, 2]:
+        assert_frame_equal(
+            per_run_updates(df, subtract_mean, params, workers=workers).pipe(
+                set_proj_dtypes, params
+            ),
+            expected,
+        )
+
+
+def test_agg_over_runs(params):
+    """Aggregating over all runs at once matches aggregating trial-by-trial."""
+    from boilerdata.stages import (  # noqa: PLC0415
+        MODEL,
+        per_trial,
+        read_frame,
+        set_proj_dtypes,
+    )
+    from boilerdata.stages.pipeline import (  # noqa: PLC0415
+        agg_over_runs,
+        fit_runs,
+        get_properties,
+    )
+
+    confidence_interval_95 = t.interval(0.95, params.records_to_average)[1]
+    df = (
+        read_frame(params.paths.file_runs, params)
+        .pipe(get_properties, params)
+        .pipe(fit_runs, params, MODEL, confidence_interval_95)
+    )
+    assert_frame_equal(
+        agg_over_runs(df, params, confidence_interval_95).pipe(set_proj_dtypes, params),
+        per_trial(df, agg_over_runs_per_trial, params, confidence_interval_95),
+    )
+
+
+def test_agg_over_runs_tc_errors(params):
+    """Thermocouple errors are each scaled from their own errors."""
+    from boilerdata.stages import MODEL, read_frame  # noqa: PLC0415
+    from boilerdata.stages.pipeline import (  # noqa: PLC0415
+        agg_over_runs,
+        fit_runs,
+        get_properties,
+    )
+
+    confidence_interval_95 = t.interval(0.95, params.records_to_average)[1]
+    scale = confidence_interval_95 / np.sqrt(params.records_to_average)
+    df = (
+        read_frame(params.paths.file_runs, params)
+        .pipe(get_properties, params)
+        .pipe(fit_runs, params, MODEL, confidence_interval_95)
+        .pipe(agg_over_runs, params, confidence_interval_95)
+    )
+    np.testing.assert_allclose(df["T_1_err"], 2.2 * scale)
+    np.testing.assert_allclose(df["T_5_err"], 1.0 * scale)
+
+
+def test_profiler(params):
+    """Profiling a step records its sizes and timings without changing its result."""
+    from boilerdata.profiling import Profiler  # noqa: PLC0415
+    from boilerdata.stages import per_trial, read_frame  # noqa: PLC0415
+
+    profiler = Profiler(slowest=1, memory=True)
+    df = read_frame(params.paths.file_runs, params)
+    assert_frame_equal(
+        df.pipe(profiler.step(per_trial), assign_subtract_mean, params),
+        per_trial(df, assign_subtract_mean, params),
+    )
+    record = profiler.steps["per_trial"]
+    trials = df.index.get_level_values("trial").nunique()
+    assert record["rows_in"] == record["rows_out"] == len(df)
+    assert record["trials"] == record["groups"] == trials
+    assert len(record["slowest_groups_s"]) == 1
+    assert record["wall_s"] >= 0
+    assert record["peak_memory_bytes"] > 0
+    # Memory is only traced on request
+    profiler = Profiler()
+    df.pipe(profiler.step(per_trial), assign_subtract_mean, params)
+    assert "peak_memory_bytes" not in profiler.steps["per_trial"]
+
+
+@pytest.mark.slow()
+def test_pipeline_profile(params, monkeypatch):
+    """The pipeline profile has timings of batches, runs, and blocks within steps."""
+    from boilerdata.stages import pipeline  # noqa: PLC0415
+
+    monkeypatch.setattr(params, "cache_fits", False)
+    pipeline.main()
+    profile = json.loads(params.paths.file_pipeline_profile.read_text(encoding="utf-8"))
+    assert any(
+        group.startswith("batch") for group in profile["fit_runs"]["slowest_groups_s"]
+    )
+    assert "scale thermocouple errors" in profile["agg_over_runs"]["slowest_groups_s"]
+    assert all("peak_memory_bytes" not in step for step in profile.values())
+
+
+def test_assign_metadata(params):
+    """Joining metadata from the trial table matches assigning it trial-by-trial."""
+    from boilerdata.stages import (  # noqa: PLC0415
+        get_trial,
+        per_trial,
+        read_frame,
+        set_proj_dtypes,
+    )
+    from boilerdata.stages.pipeline import assign_metadata  # noqa: PLC0415
+
+    def assign(grp, params):
+        return grp.assign(**{
+            field: value
+            for field, value in get_trial(grp, params).dict().items()
+            if field not in [idx.name for idx in params.axes.index]
+        })
+
+    df = read_frame(params.paths.file_runs, params)
+    assert_frame_equal(
+        assign_metadata(df, params).pipe(set_proj_dtypes, params),
+        per_trial(df, assign, params),
+    )
+
+
+def test_trial_table(params):
+    """The trial table has the thermocouples of each trial, and finds their rows."""
+    from boilerdata.stages import get_tcs, read_frame  # noqa: PLC0415
+
+    table = params.trial_table
+    for trial, (pos, tcs, tc_errors) in zip(
+        params.trials,
+        table[["thermocouple_pos", "tcs", "tc_errors"]].itertuples(index=False),
+        strict=True,
+    ):
+        assert pos == tuple(trial.thermocouple_pos.items())
+        assert (tcs, tc_errors) == get_tcs(trial)
+    trials = read_frame(params.paths.file_runs, params).index.get_level_values("trial")
+    rows = params.get_trial_rows(trials)
+    assert (table.index[rows].date == trials.date).all()
+    with pytest.raises(ValueError, match="not found"):
+        params.get_trial_rows(pd.DatetimeIndex(["1999-01-01"]))
+
+
+def test_handle_invalid_data(params):
+    """Repairing all columns in one pass matches repairing them one at a time."""
+    from boilerdata.validation import (  # noqa: PLC0415
+        handle_invalid_data,
+        validate_initial_df,
+    )
+
+    df = get_synthetic_invalid_trials(params, 1)
+    assert_frame_equal(
+        handle_invalid_data(df, validate_initial_df),
+        handle_invalid_data_per_column(df, validate_initial_df),
+    )
+
+
+def test_handle_invalid_data_nulls(params, caplog):
+    """Nulls are forward-filled like values failing checks, and repairs are logged."""
+    from boilerdata.validation import (  # noqa: PLC0415
+        columns_to_automatically_handle,
+        handle_invalid_data,
+        validate_initial_df,
+    )
+
+    df = get_synthetic_invalid_trials(params, 1)
+    col = columns_to_automatically_handle[0]
+    nulls = [5, 6, 40]
+    df.iloc[nulls, df.columns.get_loc(col)] = np.nan
+    repaired = (df[col] == 0).sum() + len(nulls)
+    with caplog.at_level(logging.INFO, logger="boilerdata.validation"):
+        result = handle_invalid_data(df, validate_initial_df)
+    # Synthetic invalid values are zero, which the old loop forward-filled
+    assert_frame_equal(
+        result, handle_invalid_data_per_column(df.fillna({col: 0}), validate_initial_df)
+    )
+    assert f"Forward-filled {repaired} invalid values of {col}." in caplog.messages
+
+
+def test_compiled_schema(params):
+    """Valid frames pass compiled schemas without falling back to `pandera`."""
+    from boilerdata.stages import read_frame  # noqa: PLC0415
+    from boilerdata.validation import passes, validate_initial_df  # noqa: PLC0415
+
+    df = read_frame(params.paths.file_runs, params)
+    assert validate_initial_df.compiled
+    assert passes(df, *validate_initial_df.compiled, validate_initial_df.schema.strict)
+    assert validate_initial_df(df) is df
+
+
+@pytest.mark.parametrize(
+    "invalidate",
+    [
+        lambda df: df.assign(T_w1=0.0),
+        lambda df: df.assign(T_1=np.nan),
+        lambda df: df.assign(T_1=df["T_1"].round().astype(int)),
+        lambda df: df.drop(columns="T_1"),
+        lambda df: df.rename_axis(index={"run": "other"}),
+    ],
+    ids=["out_of_range", "null", "dtype", "missing", "index"],
+)
+def test_compiled_schema_invalid(params, invalidate):
+    """Invalid frames fail compiled schemas, reported by `pandera`."""
+    from pandera.errors import SchemaError  # noqa: PLC0415
+
+    from boilerdata.stages import read_frame  # noqa: PLC0415
+    from boilerdata.validation import passes, validate_initial_df  # noqa: PLC0415
+
+    df = read_frame(params.paths.file_runs, params).pipe(invalidate)
+    assert validate_initial_df.compiled
+    assert not passes(
+        df, *validate_initial_df.compiled, validate_initial_df.schema.strict
+    )
+    with pytest.raises(SchemaError):
+        validate_initial_df(df)
+
+
+def test_synthetic_project(params, tmp_path):
+    """Synthetic projects have the requested runs and missing thermocouples."""
+    from boilerdata.stages.runs import get_runs  # noqa: PLC0415
+
+    missing = MISSING_PATTERNS["missing"]
+    synthetic = get_synthetic_project(params, tmp_path, len(missing), 2, 20, missing)
+    df = get_runs(synthetic, 1)
+    assert len(df) == len(missing) * 2 * params.records_to_average
+    for (_, trial), tcs in zip(df.groupby(level="trial"), missing, strict=True):
+        assert trial[params.copper_temps].isna().all().to_dict() == {
+            tc: tc in tcs for tc in params.copper_temps
+        }
+
+
+def test_params_snapshot(params):
+    """Parameter snapshots load as constructed, and go stale when runs change."""
+    from boilerdata.models.params import (  # noqa: PLC0415
+        load_params_snapshot,
+        save_params_snapshot,
+    )
+
+    def get_fields(params):
+        # Aggregation functions of category axes are lambdas, which aren't comparable
+        return (
+            params.dict(exclude={"axes"}),
+            [axis.dict(exclude={"agg"}) for axis in params.axes.all],
+            [(trial.run_files, trial.thermocouple_pos) for trial in params.trials],
+        )
+
+    save_params_snapshot(params)
+    snapshot = load_params_snapshot(params.paths)
+    assert get_fields(snapshot) == get_fields(params)
+    assert_frame_equal(snapshot.trial_table, params.trial_table)
+    new_run = params.trials[0].path / "results_2022-09-14T23-59-59.csv"
+    new_run.touch()
+    try:
+        assert load_params_snapshot(params.paths) is None
+    finally:
+        new_run.unlink()
+    assert load_params_snapshot(params.paths)
+
+
+def test_params_snapshot_invalid(params, monkeypatch):
+    """Corrupt snapshots are missed, and stale parameters aren't unpickled."""
+    from boilerdata.models import params as params_module  # noqa: PLC0415
+
+    loads = []
+    dill_loads = dill.loads
+
+    def record_loads(data):
+        loads.append(data)
+        return dill_loads(data)
+
+    path = params.paths.file_params_snapshot
+    try:
+        path.write_bytes(b"corrupt")
+        assert params_module.load_params_snapshot(params.paths) is None
+        path.write_bytes(dill.dumps(("stale", dill.dumps(params))))
+        monkeypatch.setattr(params_module.dill, "loads", record_loads)
+        assert params_module.load_params_snapshot(params.paths) is None
+        assert len(loads) == 1
+    finally:
+        monkeypatch.undo()
+        params_module.save_params_snapshot(params)
+
+
+@pytest.mark.parametrize("stage", stages)
+def test_import_stage_lazily(stage):
+    """Importing a stage doesn't construct parameters or load the model."""
+    subprocess.run(
+        check=True,
+        args=[
+            sys.executable,
+            "-c",
+            "; ".join([
+                f"import {stage}",
+                "from boilerdata.models.params import get_params",
+                "from boilerdata.stages import get_models",
+                "assert not get_params.cache_info().currsize",
+                "assert not get_models.cache_info().currsize",
+            ]),
+        ],
+    )
+
+
+def test_watch(params, tmp_path):
+    """Following a growing run parses each record once and fits like the pipeline."""
+    from boilerdata.stages import MODEL, get_run, per_run, read_frame  # noqa: PLC0415
+    from boilerdata.stages.pipeline import fit, get_properties  # noqa: PLC0415
+    from boilerdata.watch import RunFollower, watch  # noqa: PLC0415
+
+    src = params.trials[0].run_files[0]
+    run = tmp_path / src.parent.name / src.name
+    run.parent.mkdir()
+    data = src.read_bytes()
+    follower = RunFollower(params, run)
+    records: list[pd.DataFrame] = []
+    # Split the header and records partway through lines
+    for chunk in (data[:100], data[100:5000], data[5000:]):
+        with run.open("ab") as file:
+            file.write(chunk)
+        records.append(follower.read())
+    assert_frame_equal(pd.concat(records[1:]), get_run(params, src))
+    (ser,) = watch(params, run, MODEL, idle_timeout=0)
+    cols = [*params.fit.free_params, *params.fit.free_errors]
+    expected = (
+        read_frame(params.paths.file_runs, params)
+        .xs(ser.name[:-1], drop_level=False)
+        .pipe(get_properties, params)
+        .pipe(
+            per_run, fit, params, MODEL, t.interval(0.95, params.records_to_average)[1]
+        )
+    )
+    assert_series_equal(ser[cols], expected.iloc[-1][cols], check_dtype=False)
+
+
+@pytest.mark.parametrize("name", ["notes.csv", "results_2022-09-14Tnot-a-time.csv"])
+def test_get_run_index_invalid(params, name):
+    """Files with unparseable run times raise `ValueError`."""
+    from boilerdata.watch import get_run_index  # noqa: PLC0415
+
+    with pytest.raises(ValueError, match="Could not parse run time"):
+        get_run_index(params, params.trials[0].path / name)